@@ -0,0 +1,218 @@
+# Module to re-scrape postings only when they changed
+#
+# Rendering a page with get_selenium_response takes 10+ seconds, but most postings do not change between scrapes.
+# For each URL, the store keeps the validators of the last scrape: ETag and Last-Modified headers, a fingerprint of the text
+# of a plain HTTP fetch, and a fingerprint of the text of the rendered page. On refresh, a conditional HTTP request
+# (If-None-Match/If-Modified-Since) is sent first. If the server answers 304 Not Modified, or the text of the plain
+# fetch has the same fingerprint as last time, the page is not rendered again. This is trusted only for URLs whose plain fetch
+# had the same text as the rendered page the last time it was rendered, and that page had no iframes. So skipping applies
+# only to fully static pages: pages that load the posting with JavaScript or in an iframe are always rendered, since their
+# plain fetch (and its ETag) stays the same when the posting changes.
+#
+# Usage:
+# with ValidatorStore('validators.sqlite') as store:
+#     status, response = refresh(url, store)  # status: 'new', 'changed', 'unchanged', 'not_modified', 'same_fingerprint', or 'failed'
+
+# Importing libraries
+import hashlib
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+from scraper import get_selenium_response, my_user_agent
+from text_extractor import decode_html, extract_text
+
+# Statuses of refresh for which the page was not rendered
+skipped_statuses = ('not_modified', 'same_fingerprint')
+# Marker that get_page_source puts before the source code of each iframe
+frame_marker = '<!-- frame: '
+
+# Defining functions
+def text_fingerprint(html_content):
+    '''
+    Function to get a fingerprint of the text of some source code (markup, scripts, and whitespace changes do not change it).
+    Input: source code (str or bytes)
+    Output: fingerprint (str) - hex SHA-256 of extract_text(html_content)
+    Dependencies: hashlib, extract_text from text_extractor
+    '''
+    return hashlib.sha256(extract_text(html_content).encode('utf-8', 'surrogatepass')).hexdigest()
+
+def conditional_get(url, etag=None, last_modified=None, timeout=10):
+    '''
+    Function to send a (conditional) HTTP GET request without a browser.
+    Input: url (str), etag and last_modified (str or None) - validators from the last response, timeout (float, seconds)
+    Output: status (int; 304 if not modified), headers (dict with etag and last_modified), source code (str or None)
+    Dependencies: urllib, my_user_agent from scraper, decode_html from text_extractor
+    '''
+    headers = {'User-Agent': my_user_agent}
+    if etag: headers['If-None-Match'] = etag
+    if last_modified: headers['If-Modified-Since'] = last_modified
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+            body = response.read()
+            response_headers = response.headers
+            charset = response_headers.get_content_charset()
+    except urllib.error.HTTPError as error:
+        # urllib raises for 304 too
+        if error.code != 304: raise
+        return 304, {'etag': error.headers.get('ETag') or etag, 'last_modified': error.headers.get('Last-Modified') or last_modified}, None
+    return status, {'etag': response_headers.get('ETag'), 'last_modified': response_headers.get('Last-Modified')}, decode_html(body, charset)
+
+# Defining classes
+class ValidatorStore:
+    '''
+    SQLite store of the validators of each URL.
+
+    Table validators: url, etag, last_modified, quick_fingerprint (text of the plain HTTP fetch),
+    fingerprint (text of the rendered page), quick_matches (1 if the plain fetch had the text of the rendered page,
+    which had no iframes, when it was last rendered), checked_at, rendered_at.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS validators (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                                'quick_fingerprint TEXT, fingerprint TEXT, quick_matches INTEGER, checked_at REAL, rendered_at REAL)')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url):
+        '''
+        Method to get the validators of a URL.
+        Output: validators (dict) or None if the URL was never scraped
+        '''
+        cursor = self.connection.execute('SELECT etag, last_modified, quick_fingerprint, fingerprint, quick_matches, checked_at, rendered_at '
+                                         'FROM validators WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        if row is None: return None
+        validators = dict(zip(('etag', 'last_modified', 'quick_fingerprint', 'fingerprint', 'quick_matches', 'checked_at', 'rendered_at'), row))
+        validators['quick_matches'] = bool(validators['quick_matches'])
+        return validators
+
+    def save(self, url, etag, last_modified, quick_fingerprint, fingerprint, quick_matches, rendered):
+        '''
+        Method to save the validators of a URL (rendered: whether the page was rendered in this check).
+        '''
+        now = time.time()
+        with self.connection:
+            self.connection.execute('INSERT INTO validators (url, etag, last_modified, quick_fingerprint, fingerprint, quick_matches, checked_at, rendered_at) '
+                                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, '
+                                    'last_modified = excluded.last_modified, quick_fingerprint = excluded.quick_fingerprint, '
+                                    'fingerprint = excluded.fingerprint, quick_matches = excluded.quick_matches, checked_at = excluded.checked_at, '
+                                    'rendered_at = COALESCE(excluded.rendered_at, validators.rendered_at)',
+                                    (url, etag, last_modified, quick_fingerprint, fingerprint, int(quick_matches), now, now if rendered else None))
+
+def refresh(url, store, fetch=get_selenium_response, timeout=10):
+    '''
+    Function to scrape a URL again only if it changed since the last scrape.
+    Input: url (str), store (ValidatorStore), fetch (callable taking a URL and returning the source code or None,
+    like get_selenium_response), timeout (float) - seconds for the plain HTTP request
+    Output: status (str), response (source code, or None if the page was not rendered or fetch failed)
+    - 'not_modified': the server answered 304 to the conditional request (not rendered)
+    - 'same_fingerprint': the text of the plain fetch did not change (not rendered)
+    (both only if the plain fetch had the text of the rendered page, with no iframes, the last time it was rendered)
+    - 'new': first scrape of the URL
+    - 'changed' or 'unchanged': rendered, and the text of the rendered page changed or not
+    - 'failed': fetch returned None (the validators are not updated)
+    Dependencies: conditional_get, text_fingerprint
+    '''
+    validators = store.get(url)
+    # Cheap check first
+    try:
+        if validators is None:
+            status, headers, quick_response = conditional_get(url, timeout=timeout)
+        else:
+            status, headers, quick_response = conditional_get(url, validators['etag'], validators['last_modified'], timeout)
+    except Exception:
+        # Some sites block plain requests: always render them
+        status, headers, quick_response = None, {'etag': None, 'last_modified': None}, None
+    quick_fingerprint = text_fingerprint(quick_response) if quick_response is not None and status == 200 else None
+    # The plain fetch says nothing about pages whose text comes from JavaScript
+    if validators is not None and validators['fingerprint'] is not None and validators['quick_matches']:
+        if status == 304:
+            store.save(url, headers['etag'], headers['last_modified'], validators['quick_fingerprint'], validators['fingerprint'], True, False)
+            return 'not_modified', None
+        if quick_fingerprint is not None and quick_fingerprint == validators['quick_fingerprint']:
+            store.save(url, headers['etag'], headers['last_modified'], quick_fingerprint, validators['fingerprint'], True, False)
+            return 'same_fingerprint', None
+    # Full render
+    response = fetch(url)
+    if response is None: return 'failed', None
+    fingerprint = text_fingerprint(response)
+    # The plain fetch does not see the iframes, so it cannot tell when their posting changes
+    quick_matches = quick_fingerprint == fingerprint and frame_marker not in response
+    store.save(url, headers['etag'], headers['last_modified'], quick_fingerprint, fingerprint, quick_matches, True)
+    if validators is None or validators['fingerprint'] is None: return 'new', response
+    return ('unchanged' if fingerprint == validators['fingerprint'] else 'changed'), response
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import http.server
+    import os
+    import tempfile
+    import threading
+    # Local server with one page that supports ETag, one with only a changing timestamp in a script, one that blocks plain requests,
+    # and one that supports ETag but whose posting is loaded with JavaScript (the plain fetch gets only the shell)
+    pages = {'/etag': '<p>Salary: $50,000</p>', '/plain': '<p>Salary: $60,000</p>', '/blocked': '<p>Salary: $70,000</p>',
+             '/shell': '<div id="app"><p>Salary: $80,000</p></div>', '/framed': '<p>Posting</p>'}
+    shells = {'/shell': '<div id="app">Loading...</div>'}
+    # The posting of /framed is in an empty iframe when the page is rendered (as get_page_source merges it)
+    frames = {'/framed': '\n<!-- frame: /job -->\n\n<!-- end frame: /job -->'}
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/blocked':
+                self.send_error(403)
+                return
+            body = shells.get(self.path, pages[self.path])
+            etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+            if self.path in ('/etag', '/shell') and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = f'<html><script>var t = {time.time()};</script>{body}</html>'.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            if self.path in ('/etag', '/shell'): self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args):
+            pass
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    # Stand-in for get_selenium_response that counts renders
+    renders = []
+    def fetch(url):
+        renders.append(url)
+        return pages[url[len(base):]] + frames.get(url[len(base):], '')
+    path = os.path.join(tempfile.mkdtemp(), 'validators.sqlite')
+    with ValidatorStore(path) as store:
+        assert [refresh(base + page, store, fetch)[0] for page in pages] == ['new', 'new', 'new', 'new', 'new']
+        assert [refresh(base + page, store, fetch)[0] for page in pages] == ['not_modified', 'same_fingerprint', 'unchanged', 'unchanged', 'unchanged']
+        assert len(renders) == 8 and not store.get(base + '/shell')['quick_matches'] and not store.get(base + '/framed')['quick_matches']
+        assert store.get(base + '/framed')['quick_fingerprint'] == store.get(base + '/framed')['fingerprint']
+        pages['/etag'] = '<p>Salary: $55,000</p>'
+        pages['/plain'] = '<p>Salary: $65,000</p>'
+        assert refresh(base + '/etag', store, fetch) == ('changed', pages['/etag'])
+        assert refresh(base + '/plain', store, fetch) == ('changed', pages['/plain'])
+        assert refresh(base + '/plain', store, lambda url: None) == ('same_fingerprint', None)
+        assert refresh(base + '/blocked', store, lambda url: None) == ('failed', None)
+        assert store.get(base + '/blocked')['fingerprint'] == text_fingerprint(pages['/blocked'])
+        # The shell did not change (304), but the posting did
+        pages['/shell'] = '<div id="app"><p>Salary: $85,000</p></div>'
+        assert refresh(base + '/shell', store, fetch) == ('changed', pages['/shell'])
+    server.shutdown()
+    os.remove(path)
+    print("All tests passed!")
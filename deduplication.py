@@ -0,0 +1,205 @@
+# Module with functions to detect near-duplicate job postings (MinHash signatures and LSH)
+# https://en.wikipedia.org/wiki/MinHash
+# http://infolab.stanford.edu/~ullman/mmds/ch3.pdf (section 3.4)
+
+# Importing libraries
+import hashlib
+import re
+import zlib
+import numpy as np
+
+# Prime larger than any 32-bit shingle hash
+_prime = np.uint64(4294967311)
+# Pattern for words
+_word_pattern = re.compile(r'\w+')
+
+# Defining functions
+def shingle_hashes(text, shingle_size=5):
+    '''
+    Function to get the hashes of the word shingles of a text.
+    Input: text (str), shingle_size (int) - number of consecutive words per shingle
+    Output: hashes (np.ndarray of uint64 with 32-bit values, unique) - empty if the text has no words
+    Dependencies: re, zlib, numpy
+    '''
+    words = _word_pattern.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    # Short texts are a single shingle
+    n_shingles = max(len(words) - shingle_size + 1, 1)
+    hashes = {zlib.crc32(' '.join(words[i:i + shingle_size]).encode('utf-8')) for i in range(n_shingles)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+# Defining classes
+class NearDuplicateIndex:
+    '''
+    Incremental index to flag postings that are near-duplicates of postings seen before.
+
+    Each text gets a MinHash signature of num_perm values, split into bands. Texts that share a band
+    are candidates, and a candidate is a duplicate if the estimated Jaccard similarity of the shingles
+    is at least threshold. With the defaults (64 values in 8 bands of 8) pairs with similarity above
+    about 0.77 are very likely to become candidates.
+
+    Memory is bounded by max_documents: signatures live in a preallocated array, and once it is full
+    the oldest documents are forgotten. With the defaults each document takes about 320 bytes
+    (signature and band keys) plus its entries in the buckets.
+
+    Usage:
+    index = NearDuplicateIndex(max_documents=500000)
+    for posting_id, text in postings:
+        duplicate_of = index.check(posting_id, text)
+        if duplicate_of is None: process(text)
+    '''
+
+    def __init__(self, num_perm=64, bands=8, threshold=0.8, shingle_size=5, max_documents=1000000, seed=1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_documents = max_documents
+        # Hash functions (a * x + b) mod prime. a and b below 2**31 so that a * x + b fits in uint64
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, 2**31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = generator.integers(0, 2**31, size=(num_perm, 1), dtype=np.uint64)
+        # Ring buffer of signatures, band keys and ids
+        self._signatures = np.zeros((max_documents, num_perm), dtype=np.uint32)
+        self._band_keys = np.zeros((max_documents, bands), dtype=np.uint64)
+        self._ids = [None] * max_documents
+        self._next_slot = 0
+        self._size = 0
+        # One dictionary per band: band key -> list of slots
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return self._size
+
+    def signature(self, text):
+        '''
+        Method to compute the MinHash signature of a text.
+        Input: text (str)
+        Output: signature (np.ndarray of uint32 with num_perm values) or None if the text has no words
+        '''
+        hashes = shingle_hashes(text, self.shingle_size)
+        if hashes.size == 0:
+            return None
+        signature = None
+        # Process long texts in chunks to bound the size of the (num_perm, n_shingles) matrix
+        chunk_size = 4096
+        for start in range(0, hashes.size, chunk_size):
+            permuted = (self._a * hashes[start:start + chunk_size] + self._b) % _prime
+            chunk_min = permuted.min(axis=1).astype(np.uint32)
+            signature = chunk_min if signature is None else np.minimum(signature, chunk_min)
+        return signature
+
+    def _signature_band_keys(self, signature):
+        keys = np.empty(self.bands, dtype=np.uint64)
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+            keys[band] = int.from_bytes(digest, 'little')
+        return keys
+
+    def _query(self, signature, band_keys):
+        # Candidates share at least one band
+        candidates = set()
+        for band in range(self.bands):
+            candidates.update(self._buckets[band].get(int(band_keys[band]), ()))
+        if not candidates:
+            return None
+        # Estimated Jaccard similarity is the share of equal signature values
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[slots] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] >= self.threshold:
+            return self._ids[slots[best]]
+        return None
+
+    def _forget(self, slot):
+        for band in range(self.bands):
+            key = int(self._band_keys[slot, band])
+            bucket = self._buckets[band][key]
+            bucket.remove(slot)
+            if not bucket: del self._buckets[band][key]
+        self._ids[slot] = None
+        self._size -= 1
+
+    def _add(self, doc_id, signature, band_keys):
+        slot = self._next_slot
+        # Evict the oldest document if the buffer is full
+        if self._ids[slot] is not None: self._forget(slot)
+        self._signatures[slot] = signature
+        self._band_keys[slot] = band_keys
+        self._ids[slot] = doc_id
+        for band in range(self.bands):
+            self._buckets[band].setdefault(int(band_keys[band]), []).append(slot)
+        self._next_slot = (slot + 1) % self.max_documents
+        self._size += 1
+
+    def query(self, text):
+        '''
+        Method to find an indexed near-duplicate of a text without adding the text.
+        Input: text (str)
+        Output: doc_id of the most similar indexed document above the threshold, or None
+        '''
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        return self._query(signature, self._signature_band_keys(signature))
+
+    def add(self, doc_id, text):
+        '''
+        Method to add a text to the index (even if it is a duplicate). Texts without words are not indexed.
+        Input: doc_id (any hashable, not None), text (str)
+        '''
+        signature = self.signature(text)
+        if signature is not None:
+            self._add(doc_id, signature, self._signature_band_keys(signature))
+
+    def check(self, doc_id, text):
+        '''
+        Method to flag a text as a near-duplicate of a previously seen one, indexing it if it is new.
+        Input: doc_id (any hashable, not None), text (str)
+        Output: doc_id of the previously seen posting, or None if the text is new
+        '''
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        band_keys = self._signature_band_keys(signature)
+        duplicate_of = self._query(signature, band_keys)
+        if duplicate_of is None:
+            self._add(doc_id, signature, band_keys)
+        return duplicate_of
+
+def flag_duplicates(documents, **kwargs):
+    '''
+    Function to flag near-duplicates in a stream of documents.
+    Input: documents (iterable of (doc_id, text)), keyword arguments for NearDuplicateIndex
+    Output: generator of (doc_id, duplicate_of) where duplicate_of is None for new documents
+    Dependencies: NearDuplicateIndex
+    '''
+    index = NearDuplicateIndex(**kwargs)
+    for doc_id, text in documents:
+        yield doc_id, index.check(doc_id, text)
+
+if __name__ == "__main__":
+    print("Running script as main...")
+    posting = ("The Department of Counseling at Example University invites applications for a tenure-track "
+               "Assistant Professor position in Clinical Mental Health Counseling beginning August 2024. "
+               "Responsibilities include teaching graduate courses, supervising practicum and internship students, "
+               "maintaining an active research agenda, and providing service to the department and profession. "
+               "Review of applications begins November 1 and continues until the position is filled.")
+    mirrored = posting.replace("November 1", "November 15") + " Apply online."
+    other = ("Example College seeks a Director of Counseling Services to lead a team of licensed clinicians "
+             "providing short-term therapy, crisis intervention, and outreach to undergraduate students. "
+             "A master's degree and licensure are required; experience in higher education is preferred.")
+    flags = dict(flag_duplicates([(1, posting), (2, other), (3, mirrored), (4, posting.upper()), (5, ""), (6, "")]))
+    assert flags == {1: None, 2: None, 3: 1, 4: 1, 5: None, 6: None}
+    # Bounded memory: the oldest document is forgotten
+    index = NearDuplicateIndex(max_documents=1)
+    assert index.check(1, posting) is None
+    assert index.check(2, other) is None
+    assert len(index) == 1
+    assert index.query(posting) is None
+    assert index.query(other) == 2
+    print("All tests passed!")
@@ -0,0 +1,292 @@
+# Module with per-host latency and failure statistics, used to adapt the timeout and concurrency of the scraper to each host
+#
+# Some hosts (Workday, Interfolio) are always slow and others are fast. For each host, HostPolicy keeps the latest latencies
+# and the number of successes and failures, and derives:
+# - The timeout: a high percentile of the observed latencies times a margin, within [min_timeout, max_timeout].
+# - The concurrency: additive increase, multiplicative decrease (AIMD). Each success adds 1 / concurrency (so about +1 after
+#   a full round of successful requests), and each failure multiplies it by decrease, so hosts that start to block us are backed off.
+# The state is saved to a JSON file between runs.
+#
+# Usage:
+# policy = HostPolicy('host_stats.json')
+# with ScrapeQueue('scrape_queue.sqlite') as queue:
+#     scrape_with_policy(queue, save_response, policy, threads=8)
+
+# Importing libraries
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import json
+import math
+import os
+import socket
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Defining functions
+def host_of(url):
+    '''
+    Function to get the host of a URL (lowercase, without port).
+    Input: url (str)
+    Output: host (str; '' if the URL has none)
+    Dependencies: urllib.parse
+    '''
+    return urlsplit(url).hostname or ''
+
+def percentile(values, q):
+    '''
+    Function to compute a percentile with linear interpolation (like numpy.percentile).
+    Input: values (non-empty sequence of numbers), q (float between 0 and 1)
+    Output: percentile (float)
+    '''
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+# Defining classes
+class HostPolicy:
+    '''
+    Per-host statistics with the timeout and concurrency derived from them. Thread-safe.
+
+    Hosts with fewer than min_samples latencies get default_timeout. Concurrency starts at initial_concurrency,
+    stays within [1, max_concurrency], and limits how many requests to the host try_acquire lets through at the same time.
+    '''
+
+    def __init__(self, path=None, q=0.95, margin=1.5, min_timeout=10, max_timeout=120, default_timeout=30, min_samples=5,
+                 initial_concurrency=2, max_concurrency=8, decrease=0.5, history=200):
+        self.path = path
+        self.q = q
+        self.margin = margin
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.default_timeout = default_timeout
+        self.min_samples = min_samples
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.history = history
+        self.hosts = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path): self.load()
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {'latencies': deque(maxlen=self.history), 'successes': 0, 'failures': 0,
+                                'concurrency': float(self.initial_concurrency)}
+        return self.hosts[host]
+
+    def record(self, url, latency, success):
+        '''
+        Method to record a request.
+        Input: url (str), latency (float, seconds; for failures too, so that timeouts make the timeout longer), success (bool)
+        '''
+        with self._lock:
+            stats = self._host(host_of(url))
+            stats['latencies'].append(latency)
+            if success:
+                stats['successes'] += 1
+                stats['concurrency'] = min(self.max_concurrency, stats['concurrency'] + 1 / stats['concurrency'])
+            else:
+                stats['failures'] += 1
+                stats['concurrency'] = max(1.0, stats['concurrency'] * self.decrease)
+
+    def timeout(self, url):
+        '''
+        Method to get the timeout for a URL.
+        Output: timeout (float, seconds)
+        '''
+        with self._lock:
+            stats = self.hosts.get(host_of(url))
+            if stats is None or len(stats['latencies']) < self.min_samples: return float(self.default_timeout)
+            return float(min(self.max_timeout, max(self.min_timeout, percentile(stats['latencies'], self.q) * self.margin)))
+
+    def concurrency(self, url):
+        '''
+        Method to get the number of requests to the host of a URL that may run at the same time.
+        Output: concurrency (int)
+        '''
+        with self._lock:
+            stats = self.hosts.get(host_of(url))
+            return int(stats['concurrency']) if stats is not None else self.initial_concurrency
+
+    def try_acquire(self, url):
+        '''
+        Method to start a request if the host of the URL is below its concurrency (call release when it ends).
+        Output: True if the request can start
+        '''
+        limit = self.concurrency(url)
+        host = host_of(url)
+        with self._lock:
+            if self._in_flight.get(host, 0) >= limit: return False
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            return True
+
+    def release(self, url):
+        '''
+        Method to end a request started with try_acquire.
+        '''
+        host = host_of(url)
+        with self._lock:
+            self._in_flight[host] -= 1
+
+    def summary(self):
+        '''
+        Method to get the statistics of each host.
+        Output: summary (dict) - host -> dict with requests, failure_rate, median_latency, timeout, and concurrency
+        '''
+        summary = {}
+        for host in list(self.hosts):
+            url = f'http://{host}/'
+            stats = self.hosts[host]
+            requests = stats['successes'] + stats['failures']
+            summary[host] = {'requests': requests, 'failure_rate': stats['failures'] / requests if requests else None,
+                             'median_latency': percentile(stats['latencies'], 0.5) if stats['latencies'] else None,
+                             'timeout': self.timeout(url), 'concurrency': self.concurrency(url)}
+        return summary
+
+    def save(self, path=None):
+        '''
+        Method to save the state to a JSON file (written to a temporary file and moved into place).
+        '''
+        path = path or self.path
+        with self._lock:
+            state = {host: {**stats, 'latencies': list(stats['latencies'])} for host, stats in self.hosts.items()}
+        directory = os.path.dirname(os.path.abspath(path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary_path, path)
+
+    def load(self, path=None):
+        '''
+        Method to load the state saved by save.
+        '''
+        with open(path or self.path) as f:
+            state = json.load(f)
+        with self._lock:
+            for host, stats in state.items():
+                self.hosts[host] = {**stats, 'latencies': deque(stats['latencies'], maxlen=self.history),
+                                    'concurrency': min(float(self.max_concurrency), stats['concurrency'])}
+
+def _default_fetch(url, timeout, timings):
+    from scraper import get_selenium_response
+    return get_selenium_response(url, timeout=timeout, timings=timings)
+
+def scrape_with_policy(queue, handler, policy, fetch=_default_fetch, threads=4, worker=None, save_every=50, poll_seconds=5):
+    '''
+    Function to scrape the URLs of a ScrapeQueue with threads, respecting the timeout and concurrency of each host.
+    The latency recorded is the one of the navigation alone (timings['navigation'] set by fetch), or of the whole fetch if it is not set.
+    The leases of the URLs waiting for their host or running are extended while this function holds them.
+    Input: queue (ScrapeQueue), handler (callable taking a URL and the response, to save it), policy (HostPolicy),
+    fetch (callable taking a URL, a timeout, and a timings dict, and returning the source code or None; default get_selenium_response),
+    threads (int), worker (str or None for host:pid), save_every (int) - requests between saves of the policy, poll_seconds (float)
+    Output: counts (dict) with done and failed attempts
+    Dependencies: concurrent.futures, time
+    '''
+    if worker is None: worker = f"{socket.gethostname()}:{os.getpid()}"
+    counts = {'done': 0, 'failed': 0}
+    # URLs leased but waiting for their host to have room
+    waiting = []
+    running = {}
+    extended_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            if len(waiting) < threads: waiting.extend(queue.lease(worker, threads))
+            # Keep the leases while the URLs wait or run (drop the waiting URLs whose lease was lost)
+            if time.monotonic() - extended_at > queue.lease_seconds / 3:
+                waiting = [url for url in waiting if queue.extend(url, worker)]
+                for url, _, _ in running.values(): queue.extend(url, worker)
+                extended_at = time.monotonic()
+            for url in list(waiting):
+                if len(running) >= threads: break
+                if policy.try_acquire(url):
+                    waiting.remove(url)
+                    queue.extend(url, worker)
+                    timings = {}
+                    running[executor.submit(fetch, url, policy.timeout(url), timings)] = (url, time.perf_counter(), timings)
+            if not running:
+                if waiting: continue
+                if not queue.has_unfinished(): break
+                time.sleep(poll_seconds)
+                continue
+            done, _ = wait(running, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, start, timings = running.pop(future)
+                policy.release(url)
+                try:
+                    response = future.result()
+                    if response is not None: handler(url, response)
+                    error = None if response is not None else 'fetch returned None'
+                except Exception as e:
+                    error = repr(e)
+                policy.record(url, timings.get('navigation', time.perf_counter() - start), error is None)
+                if error is None:
+                    queue.complete(url, worker)
+                    counts['done'] += 1
+                else:
+                    queue.fail(url, worker, error)
+                    counts['failed'] += 1
+                if policy.path is not None and (counts['done'] + counts['failed']) % save_every == 0: policy.save()
+    if policy.path is not None: policy.save()
+    return counts
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import random
+    from scrape_queue import ScrapeQueue
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'host_stats.json')
+    # Timeouts follow the latencies of each host
+    policy = HostPolicy(path, min_samples=5)
+    assert policy.timeout('https://slow.myworkdayjobs.com/job/1') == 30
+    for latency in (20, 22, 25, 21, 40):
+        policy.record('https://slow.myworkdayjobs.com/job/1', latency, True)
+        policy.record('https://fast.example.edu/job/1', latency / 10, True)
+    assert policy.timeout('https://slow.myworkdayjobs.com/job/2') == percentile([20, 22, 25, 21, 40], 0.95) * 1.5
+    assert policy.timeout('https://fast.example.edu/job/2') == 10
+    # AIMD: about +1 per round of successes, halved on failures, never below 1
+    assert policy.concurrency('https://fast.example.edu/') == 3
+    for _ in range(3): policy.record('https://fast.example.edu/', 1, False)
+    assert policy.concurrency('https://fast.example.edu/') == 1
+    assert policy.try_acquire('https://fast.example.edu/a') and not policy.try_acquire('https://fast.example.edu/b')
+    policy.release('https://fast.example.edu/a')
+    # Saved between runs
+    policy.save()
+    assert HostPolicy(path).summary() == policy.summary()
+    # With the queue: a host that fails gets fewer requests at the same time
+    queue_path = os.path.join(directory, 'queue.sqlite')
+    urls = [f'https://{host}/job/{i}' for i in range(30) for host in ('good.example.edu', 'blocking.example.com')]
+    in_flight = {'good.example.edu': 0, 'blocking.example.com': 0}
+    peak = dict(in_flight)
+    lock = threading.Lock()
+    generator = random.Random(0)
+    def fetch(url, timeout, timings):
+        host = host_of(url)
+        with lock:
+            in_flight[host] += 1
+            peak[host] = max(peak[host], in_flight[host])
+        time.sleep(generator.uniform(0.001, 0.01))
+        with lock:
+            in_flight[host] -= 1
+        timings['navigation'] = 0.5
+        return None if host == 'blocking.example.com' else '<p>Posting</p>'
+    saved = []
+    policy = HostPolicy(os.path.join(directory, 'host_stats_queue.json'), initial_concurrency=1, max_concurrency=4)
+    # Leases shorter than the run: they are extended while the URLs wait for their host
+    with ScrapeQueue(queue_path, lease_seconds=0.05, max_attempts=1) as queue:
+        queue.add(urls)
+        counts = scrape_with_policy(queue, lambda url, response: saved.append(url), policy, fetch, threads=6, poll_seconds=0.01)
+        assert counts == {'done': 30, 'failed': 30} and len(saved) == 30
+        assert queue.stats()['pending'] == 0 and not queue.has_unfinished()
+        assert queue.connection.execute("SELECT COUNT(*) FROM jobs WHERE attempts != 1 OR error = 'lease expired'").fetchone()[0] == 0
+    assert peak['blocking.example.com'] == 1 and peak['good.example.edu'] <= 4
+    summary = policy.summary()
+    assert summary['blocking.example.com']['failure_rate'] == 1 and summary['good.example.edu']['concurrency'] == 4
+    # Only the navigation is timed
+    assert summary['good.example.edu']['median_latency'] == 0.5
+    print(summary)
+    print("All tests passed!")
@@ -0,0 +1,215 @@
+# Module with functions to extract schema.org JobPosting data embedded as JSON-LD in source code
+
+# Importing libraries
+from dataclasses import dataclass
+import json
+import re
+
+# Pattern for JSON-LD script blocks. Compiled for both str and bytes so the source code does not need to be decoded first
+# https://developers.google.com/search/docs/appearance/structured-data/job-posting
+_jsonld_pattern_bytes = re.compile(rb'<script\b[^>]*?application/ld\+json[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_jsonld_pattern_str = re.compile(_jsonld_pattern_bytes.pattern.decode('ascii'), re.IGNORECASE | re.DOTALL)
+# Some sites wrap the block in CDATA or HTML comments
+_wrapper_pattern_bytes = re.compile(rb'^\s*(?:<!\[CDATA\[|<!--)|(?:\]\]>|-->)\s*$')
+_wrapper_pattern_str = re.compile(_wrapper_pattern_bytes.pattern.decode('ascii'))
+
+# Defining classes
+@dataclass
+class JobPosting:
+    '''
+    Fields of a schema.org JobPosting that we use downstream. Missing fields are None.
+    salary_period is the unitText of baseSalary in lowercase (e.g., 'hour', 'month', 'year').
+    '''
+    title: str = None
+    employer: str = None
+    location: str = None
+    date_posted: str = None
+    employment_type: str = None
+    salary_min: float = None
+    salary_max: float = None
+    salary_currency: str = None
+    salary_period: str = None
+    description: str = None
+
+    @property
+    def has_salary(self):
+        return self.salary_min is not None or self.salary_max is not None
+
+# Defining functions
+def _has_type(node, type_name):
+    '''
+    Function to check if a JSON-LD node has a given @type (which can be a string or a list).
+    '''
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return type_name in node_type
+    return node_type == type_name
+
+def _find_job_postings(node):
+    '''
+    Function to find JobPosting nodes in parsed JSON-LD (top level, lists, and @graph).
+    '''
+    if isinstance(node, list):
+        for item in node:
+            yield from _find_job_postings(item)
+    elif isinstance(node, dict):
+        if _has_type(node, 'JobPosting'):
+            yield node
+        elif '@graph' in node:
+            yield from _find_job_postings(node['@graph'])
+
+def _to_number(value):
+    '''
+    Function to convert a JSON-LD number (which is sometimes a string like "40,000") to float.
+    '''
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').replace('$', '').strip())
+    except ValueError:
+        return None
+
+def _name(value):
+    '''
+    Function to get a name from a value that is either a string or a node with a name.
+    '''
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name')
+    return value if isinstance(value, str) and value.strip() else None
+
+def _text(value):
+    '''
+    Function to keep a value only if it is a string (JSON-LD from the wild has numbers, lists, and nodes anywhere).
+    '''
+    return value if isinstance(value, str) else None
+
+def _employment_type(value):
+    '''
+    Function to get the employment type, which can be a string or a list of strings (e.g., "FULL_TIME, PART_TIME").
+    '''
+    if isinstance(value, list):
+        value = ', '.join(item for item in value if isinstance(item, str))
+    return value if isinstance(value, str) and value else None
+
+def _location(value):
+    '''
+    Function to build "locality, region, country" from a jobLocation (Place or list of Places).
+    '''
+    places = value if isinstance(value, list) else [value]
+    locations = []
+    for place in places:
+        if not isinstance(place, dict):
+            continue
+        address = place.get('address', place)
+        if isinstance(address, str):
+            locations.append(address)
+            continue
+        if not isinstance(address, dict):
+            continue
+        parts = [address.get('addressLocality'), address.get('addressRegion'), _name(address.get('addressCountry'))]
+        parts = [part for part in parts if isinstance(part, str) and part]
+        if parts: locations.append(', '.join(parts))
+    return '; '.join(locations) if locations else None
+
+def _parse_job_posting(node):
+    '''
+    Function to convert a JobPosting node into a JobPosting record.
+    '''
+    posting = JobPosting(
+        title=_name(node.get('title')),
+        employer=_name(node.get('hiringOrganization')),
+        location=_location(node.get('jobLocation')),
+        date_posted=_text(node.get('datePosted')),
+        employment_type=_employment_type(node.get('employmentType')),
+        description=_text(node.get('description')),
+    )
+    salary = node.get('baseSalary')
+    if isinstance(salary, dict):
+        posting.salary_currency = _text(salary.get('currency'))
+        value = salary.get('value')
+        if isinstance(value, dict):
+            # QuantitativeValue with either value or minValue/maxValue
+            posting.salary_min = _to_number(value.get('minValue', value.get('value')))
+            posting.salary_max = _to_number(value.get('maxValue', value.get('value')))
+            unit = value.get('unitText') or salary.get('unitText')
+        else:
+            posting.salary_min = posting.salary_max = _to_number(value)
+            unit = salary.get('unitText')
+        if isinstance(unit, str): posting.salary_period = unit.lower()
+    elif salary is not None:
+        posting.salary_min = posting.salary_max = _to_number(salary)
+    return posting
+
+def extract_job_postings(html_content):
+    '''
+    Function to extract the JobPosting JSON-LD blocks from source code without building a DOM.
+    Input: source code (str or bytes)
+    Output: postings (list of JobPosting) - empty if there is no (valid) JobPosting block
+    Dependencies: json and re
+    '''
+    if isinstance(html_content, (bytes, bytearray, memoryview)):
+        pattern, wrapper_pattern, empty = _jsonld_pattern_bytes, _wrapper_pattern_bytes, b''
+    elif isinstance(html_content, str):
+        pattern, wrapper_pattern, empty = _jsonld_pattern_str, _wrapper_pattern_str, ''
+    else:
+        return []
+    postings = []
+    for match in pattern.finditer(html_content):
+        block = wrapper_pattern.sub(empty, match.group(1))
+        try:
+            data = json.loads(block)
+        except ValueError:
+            # json.loads raises JSONDecodeError (a ValueError) or UnicodeDecodeError (also a ValueError)
+            continue
+        postings.extend(_parse_job_posting(node) for node in _find_job_postings(data))
+    return postings
+
+def extract_job_posting(html_content):
+    '''
+    Function to extract the first JobPosting JSON-LD block from source code.
+    Input: source code (str or bytes)
+    Output: posting (JobPosting) or None
+    Dependencies: extract_job_postings
+    '''
+    postings = extract_job_postings(html_content)
+    return postings[0] if postings else None
+
+if __name__ == "__main__":
+    print("Running script as main...")
+    html = '''<html><head>
+    <script type="application/ld+json">{"@context": "https://schema.org", "@type": "Organization", "name": "X"}</script>
+    <script type="application/ld+json">
+    {"@context": "https://schema.org/", "@type": "JobPosting", "title": "Assistant Professor of Counselor Education",
+     "hiringOrganization": {"@type": "Organization", "name": "Example University"},
+     "jobLocation": {"@type": "Place", "address": {"@type": "PostalAddress", "addressLocality": "Evanston", "addressRegion": "IL", "addressCountry": "US"}},
+     "baseSalary": {"@type": "MonetaryAmount", "currency": "USD", "value": {"@type": "QuantitativeValue", "minValue": 70000, "maxValue": "80,000", "unitText": "YEAR"}}}
+    </script></head><body>Text</body></html>'''
+    posting = extract_job_posting(html)
+    assert posting.title == "Assistant Professor of Counselor Education"
+    assert posting.employer == "Example University"
+    assert posting.location == "Evanston, IL, US"
+    assert (posting.salary_min, posting.salary_max, posting.salary_currency, posting.salary_period) == (70000.0, 80000.0, 'USD', 'year')
+    assert posting.has_salary
+    assert extract_job_posting(html.encode('utf-8')) == posting
+    # @graph and no salary
+    html = '<script type="application/ld+json">{"@graph": [{"@type": ["JobPosting"], "title": "Counselor"}]}</script>'
+    posting = extract_job_posting(html)
+    assert posting.title == "Counselor" and not posting.has_salary
+    # Malformed employmentType
+    html = '<script type="application/ld+json">{"@type": "JobPosting", "title": "Counselor", "employmentType": ["FULL_TIME", 1]}</script>'
+    assert extract_job_posting(html).employment_type == "FULL_TIME"
+    # Fields that are not strings are missing
+    html = ('<script type="application/ld+json">{"@type": "JobPosting", "title": "Counselor", "employmentType": 3, "datePosted": {"@value": "2024-01-01"}, '
+            '"description": ["<p>Duties</p>"], "baseSalary": {"currency": 5, "value": 50000}}</script>')
+    posting = extract_job_posting(html)
+    assert (posting.employment_type, posting.date_posted, posting.description, posting.salary_currency, posting.salary_min) == (None, None, None, None, 50000)
+    # No JSON-LD, invalid JSON, and non-string input
+    assert extract_job_posting("<p>The salary is $30,000</p>") is None
+    assert extract_job_posting('<script type="application/ld+json">{not json</script>') is None
+    assert extract_job_posting(float('nan')) is None
+    assert extract_job_posting('<script type="application/ld+json"><!--{"@type": "JobPosting", "title": "A"}--></script>').title == "A"
+    print("All tests passed!")
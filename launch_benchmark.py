@@ -0,0 +1,80 @@
+# Script to measure how long Chrome takes to start and navigate with each launch profile of the scraper
+#
+# Usage:
+# python launch_benchmark.py --runs 10
+# python launch_benchmark.py --runs 10 --url http://127.0.0.1:8000/posting.html --headed
+#
+# For each profile, Chrome is launched runs times and the time to first navigation (from launching the driver until
+# driver.get returns) is reported, split into launch and navigation. The default URL is a small local page
+# (data: URL), so that only the browser is measured and not the network.
+
+# Importing libraries
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+from selenium import webdriver
+from scraper import get_chrome_options, get_fast_chrome_options, create_profile_template
+
+# Small page used by default
+default_url = 'data:text/html,<html><body><h1>Assistant Professor</h1><p>Salary: $70,000</p></body></html>'
+
+# Defining functions
+def time_launch(options, url):
+    '''
+    Function to launch Chrome, navigate to a URL, and quit.
+    Input: options (webdriver.ChromeOptions), url (str)
+    Output: launch and navigation times (floats, seconds)
+    Dependencies: time, selenium
+    '''
+    start = time.perf_counter()
+    driver = webdriver.Chrome(options = options)
+    try:
+        launched = time.perf_counter()
+        driver.get(url)
+        navigated = time.perf_counter()
+    finally:
+        driver.quit()
+    return launched - start, navigated - launched
+
+def run_benchmark(runs=5, url=default_url, headless=True):
+    '''
+    Function to measure the time to first navigation of each launch profile and print a report.
+    Input: runs (int), url (str), headless (bool)
+    Output: results (dict) - profile -> list of (launch, navigation) times
+    Dependencies: time_launch, get_chrome_options, get_fast_chrome_options, create_profile_template
+    '''
+    directory = tempfile.mkdtemp(prefix='launch-benchmark-')
+    try:
+        template = create_profile_template(f'{directory}/template', headless)
+        cache = f'{directory}/cache'
+        profiles = {
+            'default': lambda: (get_chrome_options(headless), None),
+            'fast': lambda: get_fast_chrome_options(headless),
+            'fast + template + shared cache': lambda: get_fast_chrome_options(headless, template, cache),
+        }
+        results = {name: [] for name in profiles}
+        # Alternate the profiles, so that a slow period of the machine does not favor one of them
+        for _ in range(runs):
+            for name, make_options in profiles.items():
+                options, user_data_dir = make_options()
+                try:
+                    results[name].append(time_launch(options, url))
+                finally:
+                    if user_data_dir is not None: shutil.rmtree(user_data_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    for name, times in results.items():
+        totals = [launch + navigation for launch, navigation in times]
+        print(f'{name}: time to first navigation median {statistics.median(totals):.2f} s, min {min(totals):.2f} s '
+              f'(launch {statistics.median(launch for launch, _ in times):.2f} s, navigation {statistics.median(navigation for _, navigation in times):.2f} s)')
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the time to first navigation of the launch profiles of the scraper.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of launches per profile')
+    parser.add_argument('--url', default=default_url, help='URL to navigate to (default: a small data: URL)')
+    parser.add_argument('--headed', action='store_true', help='Do not run Chrome in headless mode')
+    args = parser.parse_args()
+    run_benchmark(args.runs, args.url, not args.headed)
@@ -0,0 +1,235 @@
+# Module to store scraped pages compressed in a Parquet file
+#
+# Each page is compressed on its own with zstd, using a dictionary trained on the first pages written (pages from the same
+# applicant tracking systems share most of their markup, so the dictionary makes small pages compress much better).
+# The dictionary is saved in the metadata of the Parquet file. The other columns (url, fetched_at, status, page_size) are
+# small, so reading them without the pages is fast, and pages can be read one by one by URL or streamed in batches.
+#
+# Usage:
+# with PageWriter('pages.parquet') as writer:
+#     writer.write(url, get_selenium_response(url))
+# reader = PageReader('pages.parquet')
+# reader.get(url)
+# for url, page in reader.iter_pages(): extract_text(page)
+
+# Importing libraries
+import base64
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
+
+# Schema of the file
+page_schema = pa.schema([
+    ('url', pa.string()),
+    ('fetched_at', pa.timestamp('ms', tz='UTC')),
+    ('status', pa.string()),
+    ('page_size', pa.int64()),
+    ('page', pa.binary()),
+])
+
+# Key of the dictionary in the metadata of the file
+_dictionary_key = b'zstd_dictionary'
+
+# Defining functions
+def train_dictionary(pages, size=112640):
+    '''
+    Function to train a zstd dictionary on some pages.
+    Input: pages (list of str), size (int) - maximum size of the dictionary in bytes
+    Output: dictionary (bytes)
+    Dependencies: zstandard
+    '''
+    samples = [page.encode('utf-8', 'surrogatepass') for page in pages if page]
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+# Defining classes
+class PageWriter:
+    '''
+    Writer of scraped pages to a Parquet file.
+
+    If dictionary is None, the first train_size pages are kept in memory, a dictionary is trained on them, and then
+    everything is written (without a dictionary if there are fewer than min_train_pages pages). Pass dictionary=b''
+    to never use one, or the dictionary of another file (PageReader.dictionary) to reuse it.
+    '''
+
+    def __init__(self, path, dictionary=None, level=9, row_group_size=1000, train_size=1000, min_train_pages=50):
+        self.path = path
+        self.dictionary = dictionary
+        self.level = level
+        self.row_group_size = row_group_size
+        self.train_size = train_size
+        self.min_train_pages = min_train_pages
+        self._rows = []
+        self._writer = None
+        self._compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        if self.dictionary is None:
+            pages = [row[3] for row in self._rows if row[3]]
+            self.dictionary = train_dictionary(pages) if len(pages) >= self.min_train_pages else b''
+        if self.dictionary:
+            self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=zstandard.ZstdCompressionDict(self.dictionary))
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=self.level)
+        schema = page_schema.with_metadata({_dictionary_key: base64.b64encode(self.dictionary)})
+        # The pages are already compressed
+        self._writer = pq.ParquetWriter(self.path, schema, compression={'url': 'zstd', 'fetched_at': 'zstd', 'status': 'zstd',
+                                                                       'page_size': 'zstd', 'page': 'none'})
+
+    def write(self, url, page, status=None, fetched_at=None):
+        '''
+        Method to add a page.
+        Input: url (str), page (str or None, e.g., from get_selenium_response), status (str or None for 'ok' if there is
+        a page and 'failed' otherwise), fetched_at (datetime or None for now)
+        '''
+        if status is None: status = 'ok' if page is not None else 'failed'
+        if fetched_at is None: fetched_at = datetime.now(timezone.utc)
+        self._rows.append((url, fetched_at, status, page))
+        if self._writer is None and len(self._rows) < self.train_size: return
+        if self._writer is None: self._start()
+        if len(self._rows) >= self.row_group_size: self._flush()
+
+    def _flush(self):
+        if not self._rows: return
+        columns = {name: [] for name in page_schema.names}
+        for url, fetched_at, status, page in self._rows:
+            data = page.encode('utf-8', 'surrogatepass') if page is not None else None
+            columns['url'].append(url)
+            columns['fetched_at'].append(fetched_at)
+            columns['status'].append(status)
+            columns['page_size'].append(len(data) if data is not None else None)
+            columns['page'].append(self._compressor.compress(data) if data is not None else None)
+        self._writer.write_table(pa.table(columns, schema=page_schema), row_group_size=self.row_group_size)
+        self._rows = []
+
+    def close(self):
+        '''
+        Method to write the remaining pages and close the file.
+        '''
+        if self._writer is None: self._start()
+        self._flush()
+        self._writer.close()
+
+class PageReader:
+    '''
+    Reader of a file written by PageWriter.
+
+    get(url) builds an index of the urls (reading only that column) the first time, and then reads only the row group
+    with the page. If a URL was written more than once, the last page is returned.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = pq.ParquetFile(path)
+        self.dictionary = base64.b64decode(self.file.schema_arrow.metadata.get(_dictionary_key, b''))
+        if self.dictionary:
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(self.dictionary))
+        else:
+            self._decompressor = zstandard.ZstdDecompressor()
+        self._index = None
+
+    def __len__(self):
+        return self.file.metadata.num_rows
+
+    def decompress(self, data):
+        '''
+        Method to decompress a value of the page column.
+        Input: data (bytes or None)
+        Output: page (str or None)
+        '''
+        return self._decompressor.decompress(data).decode('utf-8', 'surrogatepass') if data is not None else None
+
+    def read_columns(self, columns=('url', 'fetched_at', 'status', 'page_size')):
+        '''
+        Method to read some columns without the pages.
+        Output: table (pyarrow.Table)
+        '''
+        return self.file.read(columns=list(columns))
+
+    def _build_index(self):
+        self._index = {}
+        for row_group in range(self.file.num_row_groups):
+            for row, url in enumerate(self.file.read_row_group(row_group, columns=['url']).column('url').to_pylist()):
+                self._index[url] = (row_group, row)
+
+    def get(self, url):
+        '''
+        Method to get the page of a URL.
+        Output: page (str), or None if the URL is not in the file or its page is missing
+        '''
+        if self._index is None: self._build_index()
+        if url not in self._index: return None
+        row_group, row = self._index[url]
+        data = self.file.read_row_group(row_group, columns=['page']).column('page')[row].as_py()
+        return self.decompress(data)
+
+    def iter_pages(self, batch_size=1000, columns=('url',)):
+        '''
+        Method to stream the pages, batch_size rows at a time.
+        Input: batch_size (int), columns (tuple) - other columns to return with each page
+        Output: generator of (value of each column..., page)
+        '''
+        for batch in self.file.iter_batches(batch_size=batch_size, columns=list(columns) + ['page']):
+            values = [batch.column(name).to_pylist() for name in columns]
+            for row, data in enumerate(batch.column('page').to_pylist()):
+                yield (*(value[row] for value in values), self.decompress(data))
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import os
+    import random
+    import tempfile
+    import time
+    from salary_benchmark import make_corpus
+    # Pages that look like the ones of a few applicant tracking systems
+    templates = [
+        '<!DOCTYPE html><html><head><title>{title} | Careers</title><link rel="stylesheet" href="/css/portal.css"><script src="/js/jquery.min.js"></script></head>'
+        '<body><div id="header"><a href="/">Home</a> | <a href="/jobs">Search Jobs</a></div><div class="iCIMS_JobContent"><h1>{title}</h1>'
+        '<div class="iCIMS_InfoMsg">Overview</div><p>{text}</p></div><div id="footer">Equal Opportunity Employer</div></body></html>',
+        '<html><head><meta charset="utf-8"><title>{title}</title></head><body><div data-automation-id="jobPostingHeader">{title}</div>'
+        '<div data-automation-id="jobPostingDescription"><p>{text}</p></div><button data-automation-id="applyButton">Apply</button></body></html>',
+        '<html><body><div class="job-details"><h2 class="job-title">{title}</h2><table class="job-info"><tr><th>Department</th><td>Counseling</td></tr></table>'
+        '<section class="description">{text}</section></div><script>window.analytics = {{"page": "job"}};</script></body></html>',
+    ]
+    texts, _ = make_corpus(3000, seed=2, filler_length=(5, 30))
+    generator = random.Random(2)
+    pages = [generator.choice(templates).format(title=f'Assistant Professor {i}', text=text) for i, text in enumerate(texts)]
+    urls = [f'https://jobs.example.edu/posting/{i}' for i in range(len(pages))]
+    pages[5] = None
+    directory = tempfile.mkdtemp()
+    sizes = {}
+    for name, dictionary in (('no dictionary', b''), ('dictionary', None)):
+        path = os.path.join(directory, f'{name}.parquet')
+        with PageWriter(path, dictionary=dictionary, row_group_size=500) as writer:
+            for url, page in zip(urls, pages):
+                writer.write(url, page)
+        sizes[name] = os.path.getsize(path)
+    raw_size = sum(len(page.encode('utf-8')) for page in pages if page is not None)
+    print(f"Raw pages: {raw_size / 2**20:.1f} MiB; " + '; '.join(f'zstd with {name}: {size / 2**20:.2f} MiB ({raw_size / size:.1f}x)' for name, size in sizes.items()))
+    assert sizes['dictionary'] < sizes['no dictionary']
+    reader = PageReader(path)
+    assert len(reader) == len(pages) and reader.dictionary
+    # Random access, column-only reads, and streaming
+    start = time.perf_counter()
+    assert all(reader.get(urls[i]) == pages[i] for i in generator.sample(range(len(pages)), 100))
+    print(f"100 random reads: {time.perf_counter() - start:.3f} seconds")
+    assert reader.get(urls[5]) is None and reader.get('https://missing.example.edu/') is None
+    table = reader.read_columns()
+    assert table.column_names == ['url', 'fetched_at', 'status', 'page_size'] and table.column('status')[5].as_py() == 'failed'
+    assert [page for _, page in reader.iter_pages(batch_size=256)] == pages
+    assert next(reader.iter_pages(columns=('url', 'status'))) == (urls[0], 'ok', pages[0])
+    # Reusing the dictionary, and small files without one
+    path = os.path.join(directory, 'small.parquet')
+    with PageWriter(path, dictionary=reader.dictionary) as writer:
+        writer.write(urls[0], pages[0])
+    assert PageReader(path).get(urls[0]) == pages[0]
+    with PageWriter(path) as writer:
+        writer.write(urls[0], pages[0], status='ok', fetched_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert PageReader(path).get(urls[0]) == pages[0] and not PageReader(path).dictionary
+    print("All tests passed!")
@@ -0,0 +1,306 @@
+# Module to record the HTTP traffic of page loads and replay it from a local server, to benchmark the scraper offline
+#
+# Recording uses Chrome's performance log and the DevTools protocol (Network.getResponseBody) to save every response of
+# a page load (document, scripts, frames, XHR...) to a HAR-like JSON archive. Replaying starts a local HTTP proxy that
+# answers from the archive (404 for anything not recorded), with optional latency and jitter per response. HTTPS is
+# served with a self-signed certificate, which the scraper accepts (accept_insecure_certs). The delay of each response
+# depends only on the seed and the URL, so runs are reproducible.
+#
+# Usage:
+# record_pages(urls, 'fixtures.har.json')
+# with ReplayServer('fixtures.har.json', latency=0.2, jitter=0.1) as server:
+#     response = get_selenium_response(url, options=replay_chrome_options(server))
+
+# Importing libraries
+import base64
+import http.server
+import json
+import os
+import random
+import shutil
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from selenium import webdriver
+from scraper import get_chrome_options
+
+# Headers that do not apply to the stored body (it is saved decoded and whole)
+_skipped_headers = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive',
+                    'strict-transport-security', 'alt-svc'}
+
+# Defining functions
+def _archive_url(url):
+    # Fragments are not sent to the server
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path or '/', parts.query, ''))
+
+def load_archive(path):
+    '''
+    Function to load an archive written by record_pages.
+    Input: path (str)
+    Output: entries (dict) - (method, url) -> (status, headers, body as bytes)
+    Dependencies: json, base64
+    '''
+    with open(path, encoding='utf-8') as f:
+        har = json.load(f)
+    entries = {}
+    for entry in har['log']['entries']:
+        response = entry['response']
+        content = response['content']
+        if content.get('encoding') == 'base64':
+            body = base64.b64decode(content.get('text', ''))
+        else:
+            body = content.get('text', '').encode('utf-8')
+        # Archives written before record_pages split repeated headers have them joined with newlines, as Chrome reports them
+        headers = [(header['name'], value) for header in response['headers'] if header['name'].lower() not in _skipped_headers
+                   for value in header['value'].split('\n')]
+        entries[(entry['request']['method'], _archive_url(entry['request']['url']))] = (response['status'], headers, body)
+    return entries
+
+def record_pages(urls, path, headless=True, wait=10):
+    '''
+    Function to load pages in Chrome and save all their responses to a HAR-like archive (appending to it if it exists).
+    Input: urls (list of str), path (str) - archive file, headless (bool), wait (float) - seconds to wait after each load
+    Output: number of entries in the archive (int)
+    Dependencies: selenium, get_chrome_options from scraper, json, base64
+    '''
+    har = {'log': {'version': '1.2', 'creator': {'name': 'shared_scripts replay', 'version': '1'}, 'entries': []}}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            har = json.load(f)
+    entries = {(entry['request']['method'], _archive_url(entry['request']['url'])): entry for entry in har['log']['entries']}
+    options = get_chrome_options(headless)
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    driver = webdriver.Chrome(options = options)
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        for url in urls:
+            driver.get(url)
+            time.sleep(wait)
+            methods = {}
+            for log_entry in driver.get_log('performance'):
+                message = json.loads(log_entry['message'])['message']
+                params = message.get('params', {})
+                if message['method'] == 'Network.requestWillBeSent':
+                    # Redirects come as the response of the previous request with the same id
+                    redirect = params.get('redirectResponse')
+                    if redirect is not None:
+                        entries[(methods.get(params['requestId'], 'GET'), _archive_url(redirect['url']))] = _har_entry(
+                            methods.get(params['requestId'], 'GET'), redirect, b'')
+                    methods[params['requestId']] = params['request']['method']
+                elif message['method'] == 'Network.responseReceived':
+                    response = params['response']
+                    if not response['url'].startswith(('http://', 'https://')): continue
+                    try:
+                        result = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                    except Exception:
+                        # No body (e.g., failed, or evicted from the buffer)
+                        continue
+                    body = base64.b64decode(result['body']) if result['base64Encoded'] else result['body'].encode('utf-8')
+                    method = methods.get(params['requestId'], 'GET')
+                    entries[(method, _archive_url(response['url']))] = _har_entry(method, response, body)
+            # Go to a blank page so that the next page's log starts clean
+            driver.get('about:blank')
+    finally:
+        driver.quit()
+    har['log']['entries'] = list(entries.values())
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(har, f)
+    os.replace(path + '.tmp', path)
+    return len(entries)
+
+def _har_entry(method, response, body):
+    try:
+        content = {'mimeType': response.get('mimeType', ''), 'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        content = {'mimeType': response.get('mimeType', ''), 'text': base64.b64encode(body).decode('ascii'), 'encoding': 'base64'}
+    # Chrome joins repeated headers (e.g., Set-Cookie) with newlines: one entry per value, as in HAR files
+    headers = [{'name': name, 'value': value} for name, values in response['headers'].items() for value in values.split('\n')]
+    return {'request': {'method': method, 'url': response['url']},
+            'response': {'status': response['status'], 'headers': headers, 'content': content}}
+
+def make_self_signed_certificate(directory):
+    '''
+    Function to create a self-signed certificate for the HTTPS side of the replay server (with the openssl command).
+    Input: directory (str)
+    Output: paths of the certificate and key files (str)
+    Dependencies: subprocess, openssl
+    '''
+    certificate_path = os.path.join(directory, 'replay.crt')
+    key_path = os.path.join(directory, 'replay.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '365', '-subj', '/CN=replay',
+                    '-keyout', key_path, '-out', certificate_path], check=True, capture_output=True)
+    return certificate_path, key_path
+
+def replay_chrome_options(server, headless=True):
+    '''
+    Function to build the Chrome options of the scraper with all traffic going to a replay server.
+    Input: server (ReplayServer), headless (bool)
+    Output: options (webdriver.ChromeOptions)
+    Dependencies: get_chrome_options from scraper
+    '''
+    options = get_chrome_options(headless)
+    options.add_argument(f'--proxy-server=http://127.0.0.1:{server.port}')
+    # Also for localhost, and no requests that would bypass the proxy
+    options.add_argument('--proxy-bypass-list=<-loopback>')
+    options.add_argument('--disable-background-networking')
+    return options
+
+# Defining classes
+class _ReplayHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set on the tunneled connections of CONNECT requests
+    https_origin = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_CONNECT(self):
+        replay = self.server.replay
+        self.send_response(200, 'Connection Established')
+        self.end_headers()
+        try:
+            self.connection = replay.ssl_context.wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            self.close_connection = True
+            return
+        # Read the requests in the tunnel with the same handler
+        self.rfile = self.connection.makefile('rb', self.rbufsize)
+        self.wfile = socketserver._SocketWriter(self.connection)
+        host = self.path if not self.path.endswith(':443') else self.path[:-4]
+        self.https_origin = f'https://{host}'
+        self.close_connection = False
+
+    def _replay(self, with_body=True):
+        replay = self.server.replay
+        # Requests to a proxy have the absolute URL; requests in a tunnel only have the path
+        url = self.path if self.https_origin is None else self.https_origin + self.path
+        method = 'GET' if self.command == 'HEAD' else self.command
+        entry = replay.entries.get((method, _archive_url(url)))
+        replay.delay(url)
+        with replay.lock:
+            replay.requests.append(url)
+            if entry is None: replay.misses.append(url)
+        if entry is None:
+            status, headers, body = 404, [('Content-Type', 'text/plain')], b'Not in the archive'
+        else:
+            status, headers, body = entry
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if with_body: self.wfile.write(body)
+
+    def do_GET(self):
+        self._replay()
+
+    def do_POST(self):
+        # Discard the request body
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._replay()
+
+    def do_HEAD(self):
+        self._replay(with_body=False)
+
+class ReplayServer:
+    '''
+    Local HTTP proxy that replays an archive written by record_pages.
+
+    Each response waits latency plus a uniform jitter in [-jitter, jitter] seconds (never less than 0). The delay of a URL
+    is the same in every run with the same seed. requests and misses list the URLs requested and the ones not in the archive.
+    '''
+
+    def __init__(self, archive_path, latency=0, jitter=0, seed=0, port=0, certificate=None):
+        self.entries = load_archive(archive_path)
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.requests = []
+        self.misses = []
+        self.lock = threading.Lock()
+        self._directory = None
+        if certificate is None:
+            self._directory = tempfile.mkdtemp(prefix='replay-')
+            certificate = make_self_signed_certificate(self._directory)
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_context.load_cert_chain(*certificate)
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', port), _ReplayHandler)
+        self.server.daemon_threads = True
+        self.server.replay = self
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def delay(self, url):
+        '''
+        Method to wait the (reproducible) delay of a URL.
+        '''
+        if self.latency or self.jitter:
+            seconds = self.latency + random.Random(f'{self.seed}:{url}').uniform(-self.jitter, self.jitter)
+            if seconds > 0: time.sleep(seconds)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._directory is not None: shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import urllib.error
+    import urllib.request
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'fixtures.har.json')
+    # Archive as record_pages writes it
+    responses = {'https://jobs.example.edu/posting/1': {'status': 200, 'headers': {'Content-Type': 'text/html', 'Content-Encoding': 'gzip', 'Set-Cookie': 'a=1\nb=2'},
+                                                         'mimeType': 'text/html'},
+                 'http://jobs.example.edu/logo.png': {'status': 200, 'headers': {'Content-Type': 'image/png'}, 'mimeType': 'image/png'},
+                 'https://jobs.example.edu/old': {'status': 301, 'headers': {'Location': 'https://jobs.example.edu/posting/1'}, 'mimeType': ''}}
+    bodies = {'https://jobs.example.edu/posting/1': '<p>Salary: $70,000</p>'.encode(), 'http://jobs.example.edu/logo.png': b'\x89PNG\xff\x00',
+              'https://jobs.example.edu/old': b''}
+    har = {'log': {'version': '1.2', 'entries': [_har_entry('GET', {'url': url, **response}, bodies[url]) for url, response in responses.items()]}}
+    with open(path, 'w') as f:
+        json.dump(har, f)
+    assert har['log']['entries'][0]['response']['headers'][-2:] == [{'name': 'Set-Cookie', 'value': 'a=1'}, {'name': 'Set-Cookie', 'value': 'b=2'}]
+    expected = (200, [('Content-Type', 'text/html'), ('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')], bodies['https://jobs.example.edu/posting/1'])
+    assert load_archive(path)[('GET', 'https://jobs.example.edu/posting/1')] == expected
+    # Older archives with the values still joined
+    old_path = os.path.join(directory, 'old.har.json')
+    old_entry = {'request': {'method': 'GET', 'url': 'https://jobs.example.edu/posting/1'},
+                 'response': {'status': 200, 'headers': [{'name': 'Content-Type', 'value': 'text/html'}, {'name': 'Set-Cookie', 'value': 'a=1\nb=2'}],
+                              'content': {'text': '<p>Salary: $70,000</p>'}}}
+    with open(old_path, 'w') as f:
+        json.dump({'log': {'entries': [old_entry]}}, f)
+    assert load_archive(old_path)[('GET', 'https://jobs.example.edu/posting/1')] == expected
+    with ReplayServer(path, latency=0.05, jitter=0.02) as server:
+        proxy = urllib.request.ProxyHandler({'http': f'http://127.0.0.1:{server.port}', 'https': f'http://127.0.0.1:{server.port}'})
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        opener = urllib.request.build_opener(proxy, urllib.request.HTTPSHandler(context=context))
+        # HTTPS through the tunnel (following the recorded redirect), and HTTP
+        start = time.perf_counter()
+        with opener.open('https://jobs.example.edu/old#apply') as response:
+            assert response.read() == bodies['https://jobs.example.edu/posting/1'] and response.url == 'https://jobs.example.edu/posting/1'
+            assert response.headers.get_all('Set-Cookie') == ['a=1', 'b=2']
+        assert time.perf_counter() - start >= 2 * (0.05 - 0.02)
+        with opener.open('http://jobs.example.edu/logo.png') as response:
+            assert response.read() == bodies['http://jobs.example.edu/logo.png']
+        try:
+            opener.open('https://jobs.example.edu/missing')
+            assert False
+        except urllib.error.HTTPError as error:
+            assert error.code == 404
+        assert server.misses == ['https://jobs.example.edu/missing'] and len(server.requests) == 4
+    shutil.rmtree(directory)
+    print("All tests passed!")
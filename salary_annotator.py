@@ -0,0 +1,194 @@
+# Script to annotate stored job posting texts with salary information in parallel
+#
+# Usage:
+# python salary_annotator.py postings.parquet salaries.parquet --id-column id --text-column text
+# python salary_annotator.py postings_directory/ salaries.parquet --workers 8
+#
+# The input is either a Parquet file with an id and a text column, or a directory of .txt files (the id is the relative path).
+# Texts are processed in chunks by a process pool. Each chunk is written to its own Parquet file in <output>.parts/,
+# so an interrupted run resumes from the chunks that are missing. At the end, the chunks are combined into the output file.
+# Run it without arguments to run the tests.
+
+# Importing libraries
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import os
+import shutil
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from salary_functions import check_salary, parse_salary
+
+# Schema of the output
+output_schema = pa.schema([
+    ('id', pa.string()),
+    ('salary_info', pa.string()),
+    ('salary_min', pa.float64()),
+    ('salary_max', pa.float64()),
+    ('salary_currency', pa.string()),
+    ('salary_period', pa.string()),
+    ('salary_records', pa.int32()),
+])
+
+# Defining functions
+def read_chunks(input_path, chunk_size, id_column='id', text_column='text'):
+    '''
+    Function to read the input in chunks.
+    Input: input_path (str) - Parquet file or directory of .txt files, chunk_size (int), id_column and text_column (str) for Parquet
+    Output: generator of (ids, texts) - lists of str. For directories, texts are file paths (read by the workers)
+    Dependencies: os, pyarrow
+    '''
+    if os.path.isdir(input_path):
+        paths = []
+        for root, _, files in os.walk(input_path):
+            paths.extend(os.path.join(root, file) for file in files if file.endswith('.txt'))
+        # Sorted so that chunks are the same when resuming
+        paths.sort()
+        for start in range(0, len(paths), chunk_size):
+            chunk = paths[start:start + chunk_size]
+            yield [os.path.relpath(path, input_path) for path in chunk], chunk
+    else:
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=[id_column, text_column]):
+            yield [str(value) for value in batch.column(id_column).to_pylist()], batch.column(text_column).to_pylist()
+
+def annotate_texts(ids, texts, parse=True):
+    '''
+    Function to annotate texts with check_salary and (optionally) parse_salary.
+    Input: ids (list of str), texts (list of str or other), parse (bool) - whether to run parse_salary
+    Output: table (pyarrow.Table with output_schema). Salary columns are from the first record found by parse_salary
+    Dependencies: check_salary and parse_salary from salary_functions, pyarrow
+    '''
+    columns = {name: [] for name in output_schema.names}
+    for id_, text in zip(ids, texts):
+        records = parse_salary(text) if parse else []
+        first = records[0] if records else None
+        columns['id'].append(id_)
+        columns['salary_info'].append(check_salary(text))
+        columns['salary_min'].append(first.min_amount if first else None)
+        columns['salary_max'].append(first.max_amount if first else None)
+        columns['salary_currency'].append(first.currency if first else None)
+        columns['salary_period'].append(first.period if first else None)
+        columns['salary_records'].append(len(records) if parse else None)
+    return pa.table(columns, schema=output_schema)
+
+def _part_path(parts_directory, chunk_index):
+    return os.path.join(parts_directory, f'part-{chunk_index:06d}.parquet')
+
+def annotate_chunk(chunk_index, ids, texts, parts_directory, from_files=False, parse=True):
+    '''
+    Function to annotate one chunk and write it to its part file (run in the worker processes).
+    Input: chunk_index (int), ids (list of str), texts (list of str, or of paths if from_files), parts_directory (str), from_files (bool), parse (bool)
+    Output: chunk_index (int), number of texts (int)
+    Dependencies: annotate_texts, os, pyarrow
+    '''
+    if from_files:
+        paths = texts
+        texts = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                texts.append(f.read())
+    table = annotate_texts(ids, texts, parse)
+    # Write to a temporary file and move it into place, so a part file is either complete or missing
+    path = _part_path(parts_directory, chunk_index)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return chunk_index, len(ids)
+
+def annotate(input_path, output_path, workers=None, chunk_size=1000, id_column='id', text_column='text', parse=True, verbose=True):
+    '''
+    Function to annotate stored postings with salary information in parallel, resuming from previous runs.
+    Input: input_path (str) - Parquet file or directory of .txt files, output_path (str) - Parquet file,
+    workers (int or None for all CPUs), chunk_size (int), id_column and text_column (str), parse (bool), verbose (bool)
+    Output: number of texts annotated in this run (int)
+    Dependencies: read_chunks, annotate_chunk, concurrent.futures, pyarrow
+    Note: resuming only works with the same input and chunk_size.
+    '''
+    parts_directory = output_path + '.parts'
+    os.makedirs(parts_directory, exist_ok=True)
+    from_files = os.path.isdir(input_path)
+    workers = workers or os.cpu_count()
+    start_time = time.perf_counter()
+    annotated = 0
+    n_chunks = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk_index, (ids, texts) in enumerate(read_chunks(input_path, chunk_size, id_column, text_column)):
+            n_chunks += 1
+            # Checkpoint: skip chunks done in a previous run
+            if os.path.exists(_part_path(parts_directory, chunk_index)):
+                continue
+            # Keep a bounded number of chunks in memory
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                annotated += sum(future.result()[1] for future in done)
+            pending.add(executor.submit(annotate_chunk, chunk_index, ids, texts, parts_directory, from_files, parse))
+            if verbose: print(f'Submitted chunk {chunk_index} ({annotated} texts annotated, {annotated / (time.perf_counter() - start_time):,.0f} texts/sec)')
+        annotated += sum(future.result()[1] for future in wait(pending).done)
+    # Combine the chunks in order and remove the parts
+    with pq.ParquetWriter(output_path + '.tmp', output_schema) as writer:
+        for chunk_index in range(n_chunks):
+            writer.write_table(pq.read_table(_part_path(parts_directory, chunk_index), schema=output_schema))
+    os.replace(output_path + '.tmp', output_path)
+    shutil.rmtree(parts_directory)
+    if verbose: print(f'Annotated {annotated} texts in {time.perf_counter() - start_time:.1f} seconds. Output: {output_path}')
+    return annotated
+
+def main(argv=None):
+    '''
+    Function to run the script from the command line.
+    '''
+    parser = argparse.ArgumentParser(description='Annotate stored job posting texts with salary information.')
+    parser.add_argument('input', help='Parquet file with id and text columns, or directory of .txt files')
+    parser.add_argument('output', help='Output Parquet file')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Number of texts per chunk (keep it the same when resuming)')
+    parser.add_argument('--id-column', default='id')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--no-parse', action='store_true', help='Only run check_salary, not parse_salary')
+    args = parser.parse_args(argv)
+    annotate(args.input, args.output, args.workers, args.chunk_size, args.id_column, args.text_column, not args.no_parse)
+
+def _test():
+    '''
+    Function to test annotate, including resuming an interrupted run.
+    '''
+    import tempfile
+    directory = tempfile.mkdtemp()
+    texts = ['The salary is $30,000 - $40,000 per year.', 'The salary is 30,000 per year.', 'No salary here.', None] * 7
+    input_path = os.path.join(directory, 'postings.parquet')
+    pq.write_table(pa.table({'id': [f'posting-{i}' for i in range(len(texts))], 'text': texts}), input_path)
+    # Uninterrupted run
+    expected_path = os.path.join(directory, 'expected.parquet')
+    assert annotate(input_path, expected_path, workers=2, chunk_size=10, verbose=False) == len(texts)
+    expected = pq.read_table(expected_path)
+    assert expected.num_rows == len(texts) and expected.column('salary_min')[0].as_py() == 30000
+    assert expected.column('salary_info').to_pylist()[:4] == ['money_sign_digits', 'keyword_numbers', None, 'input_is_not_string']
+    # Interrupted run: every chunk was written but the second one, so resuming only annotates that chunk
+    output_path = os.path.join(directory, 'salaries.parquet')
+    parts_directory = output_path + '.parts'
+    os.makedirs(parts_directory)
+    for chunk_index, (ids, chunk_texts) in enumerate(read_chunks(input_path, 10)):
+        annotate_chunk(chunk_index, ids, chunk_texts, parts_directory)
+    os.remove(_part_path(parts_directory, 1))
+    assert annotate(input_path, output_path, workers=2, chunk_size=10, verbose=False) == 10
+    assert pq.read_table(output_path).equals(expected)
+    assert not os.path.exists(parts_directory)
+    # Directory of .txt files
+    texts_directory = os.path.join(directory, 'texts')
+    os.makedirs(os.path.join(texts_directory, 'sub'))
+    for name, text in (('a.txt', texts[0]), (os.path.join('sub', 'b.txt'), texts[2])):
+        with open(os.path.join(texts_directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+    assert annotate(texts_directory, output_path, workers=1, verbose=False) == 2
+    assert pq.read_table(output_path).column('salary_info').to_pylist() == ['money_sign_digits', None]
+    shutil.rmtree(directory)
+    print("All tests passed!")
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) == 1:
+        print("Running script as main...")
+        _test()
+    else:
+        main()
@@ -0,0 +1,144 @@
+# Script to measure the accuracy and speed of the salary detection functions
+#
+# Usage:
+# python salary_benchmark.py --docs 5000 --seed 0
+#
+# Builds a labelled synthetic corpus of job posting snippets and reports, for each engine:
+# precision and recall per label, throughput (docs/sec), and peak memory (tracemalloc).
+# Run it before and after changing salary_functions so that speed optimizations do not silently change results.
+
+# Importing libraries
+import argparse
+import random
+import time
+import tracemalloc
+from salary_functions import check_salary, check_salary_windowed, check_salary_column
+
+# Labels
+labels = ('money_sign_digits', 'keyword_numbers', None)
+
+# Snippets for the synthetic corpus: (template, label). {filler} is replaced with unrelated posting text
+snippets = [
+    ('The salary for this position is $30,000 - $40,000 per year.', 'money_sign_digits'),
+    ('The salary for this position is $30k - $40k per year.', 'money_sign_digits'),
+    ('The salary for this position is $30,000 per year.', 'money_sign_digits'),
+    ('The salary for this position is $10 per hour.', 'money_sign_digits'),
+    ('The salary for this position is $10 - $20 per hour.', 'money_sign_digits'),
+    ('Compensation: £45,000 to £50,000 depending on experience.', 'money_sign_digits'),
+    ('{filler} Salary range: € 52.000 - € 60.000. {filler}', 'money_sign_digits'),
+    ('{filler} Pay: $25/hour. {filler}', 'money_sign_digits'),
+    ('The salary for this position is 30,000 - 40,000 per year.', 'keyword_numbers'),
+    ('The salary for this position is 30,000 per year.', 'keyword_numbers'),
+    ('{filler} Starting salary 58.500 plus benefits. {filler}', 'keyword_numbers'),
+    ('{filler} Compensation: 72000 annually. {filler}', 'keyword_numbers'),
+    ('The salary for this position is ten per hour.', None),
+    ('Salary commensurate with experience.', None),
+    ('{filler}', None),
+    ('{filler} Competitive salary and benefits. {filler}', None),
+    ('{filler} Application fee of $50 can be paid with PayPal. {filler}', None),
+    ('{filler} Eligible for loan repayment programs of up to $10,000. {filler}', None),
+]
+
+# Sentences for the filler
+filler_sentences = [
+    'The Department of Counseling invites applications for a tenure-track Assistant Professor position.',
+    'Responsibilities include teaching graduate courses and supervising practicum students.',
+    'Review of applications begins November 1, 2024 and continues until the position is filled.',
+    'The university enrolls 25,000 students across 12 colleges.',
+    'Candidates should hold a doctorate from a CACREP-accredited program.',
+    'Submit a cover letter, curriculum vitae, and three letters of reference.',
+]
+
+# Defining functions
+def make_corpus(n_docs, seed=0, filler_length=(0, 40)):
+    '''
+    Function to build a labelled synthetic corpus.
+    Input: n_docs (int), seed (int), filler_length (tuple) - min and max number of filler sentences
+    Output: texts (list of str), expected (list of str or None)
+    Dependencies: random
+    '''
+    generator = random.Random(seed)
+    texts = []
+    expected = []
+    for _ in range(n_docs):
+        template, label = generator.choice(snippets)
+        text = template
+        while '{filler}' in text:
+            filler = ' '.join(generator.choice(filler_sentences) for _ in range(generator.randint(*filler_length)))
+            text = text.replace('{filler}', filler, 1)
+        texts.append(text)
+        expected.append(label)
+    return texts, expected
+
+def precision_recall(expected, predicted):
+    '''
+    Function to compute precision and recall per label.
+    Input: expected and predicted (lists of labels)
+    Output: scores (dict) - label -> (precision, recall, support); precision/recall are None when undefined
+    '''
+    scores = {}
+    for label in labels:
+        true_positives = sum(1 for e, p in zip(expected, predicted) if e == label and p == label)
+        predicted_positives = sum(1 for p in predicted if p == label)
+        support = sum(1 for e in expected if e == label)
+        scores[label] = (true_positives / predicted_positives if predicted_positives else None,
+                         true_positives / support if support else None,
+                         support)
+    return scores
+
+def run_engine(engine, texts):
+    '''
+    Function to run an engine over the texts, measuring time and peak memory.
+    Input: engine (callable taking the list of texts and returning a list of labels), texts (list of str)
+    Output: predicted (list of labels), docs_per_second (float), peak_memory (int, bytes)
+    Dependencies: time, tracemalloc
+    '''
+    # Warm up (imports, caches), then time without tracemalloc, which slows Python down
+    engine(texts[:10])
+    start = time.perf_counter()
+    predicted = list(engine(texts))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    engine(texts)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return predicted, len(texts) / elapsed if elapsed > 0 else float('inf'), peak_memory
+
+# Engines to compare. Each takes a list of texts and returns a list of labels
+engines = {
+    'check_salary': lambda texts: [check_salary(text) for text in texts],
+    'check_salary_windowed': lambda texts: [check_salary_windowed(text)[0] for text in texts],
+    'check_salary_column': lambda texts: check_salary_column(texts).tolist(),
+}
+
+def run_benchmark(n_docs=5000, seed=0, engines=engines, reference='check_salary'):
+    '''
+    Function to run all the engines over a synthetic corpus and print a report.
+    Input: n_docs (int), seed (int), engines (dict) - name -> engine, reference (str) - engine the others are compared to
+    Output: results (dict) - name -> dict with scores, docs_per_second, peak_memory, and disagreements with the reference
+    Dependencies: make_corpus, run_engine, precision_recall
+    '''
+    texts, expected = make_corpus(n_docs, seed)
+    print(f'Corpus: {n_docs} documents, {sum(len(text) for text in texts) / n_docs:,.0f} characters on average')
+    results = {}
+    for name, engine in engines.items():
+        predicted, docs_per_second, peak_memory = run_engine(engine, texts)
+        results[name] = {'predicted': predicted, 'scores': precision_recall(expected, predicted),
+                         'docs_per_second': docs_per_second, 'peak_memory': peak_memory}
+    for name, result in results.items():
+        if reference in results:
+            result['disagreements'] = sum(1 for p, r in zip(result['predicted'], results[reference]['predicted']) if p != r)
+        print(f'\n{name}: {result["docs_per_second"]:,.0f} docs/sec, peak memory {result["peak_memory"] / 2**20:,.1f} MiB'
+              + (f', {result["disagreements"]} disagreements with {reference}' if 'disagreements' in result else ''))
+        for label, (precision, recall, support) in result['scores'].items():
+            precision = '-' if precision is None else f'{precision:.3f}'
+            recall = '-' if recall is None else f'{recall:.3f}'
+            print(f'  {str(label):<18} precision {precision:>5}  recall {recall:>5}  support {support}')
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the accuracy and speed of the salary detection functions.')
+    parser.add_argument('--docs', type=int, default=5000, help='Number of documents in the synthetic corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.docs, args.seed)
@@ -0,0 +1,187 @@
+# Module with a registry of salary rules (keywords and patterns with labels and priorities) compiled into one matcher
+#
+# With google-re2 installed (pip install google-re2), all the keywords and patterns are compiled into one re2.Set,
+# which finds every rule that matches in a single pass over the text. The cost stays about the same from 2 to 50 rules.
+# Without it, each pattern is searched for with Python's re, in order of priority, stopping at the first label found.
+#
+# Usage:
+# registry = default_salary_rules()
+# registry.add_rule('hourly_rate', r'[€£$]\s?\d{1,3}(?:\.\d{2})?\s?(?:/|per\s)h', priority=3)
+# registry.compile()
+# registry.evaluate(text)
+
+# Importing libraries
+import hashlib
+import re
+from salary_functions import salary_keywords, money_sign_digits_pattern, keyword_numbers_pattern, money_sign_digits_regex, keyword_numbers_regex
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Defining functions
+def case_insensitive_regex(word):
+    '''
+    Function to build a case-insensitive regex for a word with character classes (e.g., 'pay' -> '[pP][aA][yY]').
+    For ASCII words, this is the same as lowercasing the text and looking for the word, in both re and RE2.
+    Input: word (str)
+    Output: regex (str)
+    Dependencies: re
+    '''
+    return ''.join(f'[{re.escape(letter.lower())}{re.escape(letter.upper())}]' if letter.lower() != letter.upper() else re.escape(letter)
+                   for letter in word)
+
+# Defining classes
+class SalaryRule:
+    '''
+    Rule of a SalaryRuleRegistry: a label returned when the pattern matches.
+    pattern is for Python's re, and re2_pattern for RE2 (the same as pattern if not given).
+    '''
+
+    def __init__(self, label, pattern, priority, requires_keyword, re2_pattern):
+        self.label = label
+        self.pattern = re.compile(pattern)
+        self.priority = priority
+        self.requires_keyword = requires_keyword
+        self.re2_pattern = re2_pattern if re2_pattern is not None else pattern
+
+class SalaryRuleRegistry:
+    '''
+    Registry of salary keywords and rules.
+
+    evaluate(text) returns the label of the rule with the highest priority whose pattern is found in the text.
+    Rules with requires_keyword=True only count if one of the keywords is also in the text (in any case).
+    Rules with the same priority are taken in the order they were added. Non-strings return 'input_is_not_string'.
+
+    Patterns should use syntax that RE2 also understands (no lookarounds or backreferences). Note that \\d, \\s, and \\b
+    are Unicode-aware in re but ASCII-only in RE2; pass re2_pattern to add_rule if the difference matters.
+    '''
+
+    def __init__(self, use_re2=None):
+        self.keywords = []
+        self.rules = []
+        self.use_re2 = re2 is not None if use_re2 is None else use_re2
+        if self.use_re2 and re2 is None:
+            raise ImportError("use_re2=True requires google-re2 (pip install google-re2).")
+        self._compiled = False
+
+    def add_keyword(self, keyword):
+        '''
+        Method to add a keyword (matched as a substring in any case, as in check_salary).
+        '''
+        self.keywords.append(keyword.lower())
+        self._compiled = False
+
+    def add_rule(self, label, pattern, priority=0, requires_keyword=True, re2_pattern=None):
+        '''
+        Method to add a rule.
+        Input: label (str), pattern (str) - regex for re, priority (int) - higher wins,
+        requires_keyword (bool), re2_pattern (str or None) - regex for RE2 if it has to differ from pattern
+        '''
+        self.rules.append(SalaryRule(label, pattern, priority, requires_keyword, re2_pattern))
+        self._compiled = False
+
+    @property
+    def version(self):
+        '''
+        Hash of the keywords and rules, to use as the rule version of stored results (see salary_store).
+        '''
+        rules = repr((self.keywords, [(rule.label, rule.pattern.pattern, rule.priority, rule.requires_keyword, rule.re2_pattern)
+                                      for rule in self.rules]))
+        return hashlib.sha256(rules.encode('utf-8')).hexdigest()[:16]
+
+    def compile(self):
+        '''
+        Method to compile the keywords and rules (called by evaluate if needed).
+        '''
+        # Rules in order of priority (sorted is stable, so ties keep the order they were added in)
+        self._ordered_rules = sorted(self.rules, key=lambda rule: -rule.priority)
+        if self.use_re2:
+            options = re2.Options()
+            self._set = re2.Set.SearchSet(options)
+            # Index 0 is the keywords, and index i + 1 is rule i of the ordered rules
+            self._set.Add('|'.join(case_insensitive_regex(keyword) for keyword in self.keywords) if self.keywords else '[^\\x00-\\x{10FFFF}]')
+            for rule in self._ordered_rules:
+                self._set.Add(rule.re2_pattern)
+            self._set.Compile()
+        self._compiled = True
+
+    def _evaluate_re2(self, text):
+        matched = set(self._set.Match(text) or ())
+        has_keyword = 0 in matched
+        for index, rule in enumerate(self._ordered_rules, start=1):
+            if index in matched and (has_keyword or not rule.requires_keyword):
+                return rule.label
+        return None
+
+    def _evaluate_re(self, text):
+        has_keyword = None
+        for rule in self._ordered_rules:
+            if rule.requires_keyword:
+                # Lowercase only once, and only if needed
+                if has_keyword is None:
+                    lowered = text.lower()
+                    has_keyword = any(keyword in lowered for keyword in self.keywords)
+                if not has_keyword:
+                    continue
+            if rule.pattern.search(text):
+                return rule.label
+        return None
+
+    def evaluate(self, text):
+        '''
+        Method to evaluate the rules on a text.
+        Input: text (str) - job posting text
+        Output: label (str) or None
+        '''
+        if not isinstance(text, str):
+            return 'input_is_not_string'
+        if not self._compiled: self.compile()
+        return self._evaluate_re2(text) if self.use_re2 else self._evaluate_re(text)
+
+def default_salary_rules(use_re2=None):
+    '''
+    Function to get a registry with the rules of check_salary (it gives the same labels).
+    Input: use_re2 (bool or None to use RE2 if installed)
+    Output: registry (SalaryRuleRegistry)
+    Dependencies: salary_functions
+    '''
+    registry = SalaryRuleRegistry(use_re2)
+    for keyword in salary_keywords:
+        registry.add_keyword(keyword)
+    registry.add_rule('money_sign_digits', money_sign_digits_pattern.pattern, priority=2, re2_pattern=money_sign_digits_regex)
+    registry.add_rule('keyword_numbers', keyword_numbers_pattern.pattern, priority=1, re2_pattern=keyword_numbers_regex)
+    return registry
+
+if __name__ == "__main__":
+    print("Running script as main...")
+    import random
+    from salary_functions import check_salary, benchmark
+    # Same labels as check_salary, with and without RE2
+    generator = random.Random(0)
+    pieces = ['Salary', 'PAY', 'paypal', 'compensation', '$', '€ ', '£', '30,000', '1234', '12.345', '٣٠٠٠',
+              ' ', ' ', '_1234', 'a1234', '1,23456', '7', 'İ', 'x', '\n']
+    texts = [''.join(generator.choice(pieces) for _ in range(generator.randint(0, 12))) for _ in range(20000)] + [None, 30000]
+    backends = [False, True] if re2 is not None else [False]
+    for use_re2 in backends:
+        registry = default_salary_rules(use_re2)
+        assert [registry.evaluate(text) for text in texts] == [check_salary(text) for text in texts]
+    # Priorities, rules without keywords, and the order of ties
+    registry = default_salary_rules()
+    registry.add_rule('hourly_rate', r'[€£$]\s?\d{1,3}(?:\.\d{2})?\s?(?:/|per\s)h', priority=3)
+    registry.add_rule('stipend', r'[sS]tipend', priority=0, requires_keyword=False)
+    assert registry.evaluate('Pay: $25/hour') == 'hourly_rate'
+    assert registry.evaluate('Pay: $25,000/year') == 'money_sign_digits'
+    assert registry.evaluate('A stipend is provided.') == 'stipend'
+    assert registry.evaluate('A stipend of $500.') == 'stipend'
+    assert registry.version != default_salary_rules().version
+    # Throughput with 2 and 50 rules
+    filler = 'The department invites applications for a tenure-track position beginning August 2024. ' * 50
+    texts = [filler, filler + 'The salary is $70,000.', 'Salary: ' + filler, filler + 'Pay range 45,000 to 50,000.'] * 250
+    for use_re2 in backends:
+        for n_extra in (0, 48):
+            registry = default_salary_rules(use_re2)
+            for i in range(n_extra):
+                registry.add_rule(f'extra{i}', rf'\b(?:bonus|stipend){i}\b', priority=-1, requires_keyword=False)
+            print(f"{'re2' if use_re2 else 're'} backend, {len(registry.rules)} rules: {benchmark(registry.evaluate, texts):,.0f} docs/sec")
+    print("All tests passed!")
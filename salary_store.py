@@ -0,0 +1,162 @@
+# Module with a store of salary detection results keyed by text hash and rule version
+#
+# Re-running check_salary over the whole corpus after a small rule change is slow. The store keeps the result of each
+# (text hash, rule version) pair, so a re-run only evaluates texts that are new, changed, or were evaluated with other rules.
+#
+# Usage:
+# store = SalaryResultStore('salary_results.sqlite')
+# counts = store.annotate(documents)  # documents: iterable of (doc_id, text)
+# for doc_id, info_found in store.results(): ...
+
+# Importing libraries
+import hashlib
+import sqlite3
+from salary_functions import check_salary, salary_rules_version, salary_keywords, money_sign_digits_pattern, keyword_numbers_pattern
+
+# Maximum number of parameters in one SQLite query (the default limit is 999 in old versions)
+_max_parameters = 900
+
+# Defining functions
+def default_rules_version():
+    '''
+    Function to get the version of the rules of check_salary: salary_rules_version plus a hash of the keywords and patterns,
+    so that editing a pattern makes stored results stale even if salary_rules_version was not bumped.
+    Output: rules_version (str)
+    Dependencies: hashlib, salary_functions
+    '''
+    rules = repr((salary_keywords, money_sign_digits_pattern.pattern, keyword_numbers_pattern.pattern))
+    return f"{salary_rules_version}:{hashlib.sha256(rules.encode('utf-8')).hexdigest()[:12]}"
+
+def text_hash(text):
+    '''
+    Function to hash a text (non-strings are hashed with their type, so that 30000 and '30000' differ).
+    Input: text (str or other)
+    Output: hash (str) - hex SHA-256
+    Dependencies: hashlib
+    '''
+    if isinstance(text, str):
+        data = b's' + text.encode('utf-8', 'surrogatepass')
+    else:
+        data = f'{type(text).__name__}:{text!r}'.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+# Defining classes
+class SalaryResultStore:
+    '''
+    SQLite store of salary detection results.
+
+    Tables:
+    - documents (doc_id, text_hash): latest text hash of each document
+    - results (text_hash, rules_version, info_found): result of the rules on each text
+
+    The function must return a str or None (like check_salary).
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, text_hash TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (text_hash TEXT NOT NULL, rules_version TEXT NOT NULL, '
+                                'info_found TEXT, PRIMARY KEY (text_hash, rules_version))')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _evaluated_hashes(self, hashes, rules_version):
+        evaluated = set()
+        hashes = list(hashes)
+        for start in range(0, len(hashes), _max_parameters):
+            chunk = hashes[start:start + _max_parameters]
+            query = f"SELECT text_hash FROM results WHERE rules_version = ? AND text_hash IN ({','.join('?' * len(chunk))})"
+            evaluated.update(row[0] for row in self.connection.execute(query, [rules_version, *chunk]))
+        return evaluated
+
+    def annotate(self, documents, function=check_salary, rules_version=None, batch_size=10000):
+        '''
+        Method to annotate documents, evaluating only the texts without a result for this rule version.
+        Input: documents (iterable of (doc_id, text)), function (callable taking a text), rules_version (str or None
+        for default_rules_version(); must be given if function is not check_salary), batch_size (int)
+        Output: counts (dict) with documents, evaluated (texts the function was run on), and reused (documents with a stored result)
+        '''
+        if rules_version is None:
+            if function is not check_salary:
+                raise ValueError("rules_version is required when function is not check_salary.")
+            rules_version = default_rules_version()
+        counts = {'documents': 0, 'evaluated': 0, 'reused': 0}
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                self._annotate_batch(batch, function, rules_version, counts)
+                batch = []
+        if batch: self._annotate_batch(batch, function, rules_version, counts)
+        return counts
+
+    def _annotate_batch(self, batch, function, rules_version, counts):
+        hashed = [(str(doc_id), text_hash(text), text) for doc_id, text in batch]
+        evaluated = self._evaluated_hashes({hash_ for _, hash_, _ in hashed}, rules_version)
+        # Evaluate each new text once, even if several documents have it
+        new_results = {}
+        for _, hash_, text in hashed:
+            if hash_ not in evaluated and hash_ not in new_results:
+                new_results[hash_] = function(text)
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO documents (doc_id, text_hash) VALUES (?, ?)',
+                                        [(doc_id, hash_) for doc_id, hash_, _ in hashed])
+            self.connection.executemany('INSERT OR REPLACE INTO results (text_hash, rules_version, info_found) VALUES (?, ?, ?)',
+                                        [(hash_, rules_version, info_found) for hash_, info_found in new_results.items()])
+        counts['documents'] += len(hashed)
+        counts['evaluated'] += len(new_results)
+        counts['reused'] += sum(1 for _, hash_, _ in hashed if hash_ in evaluated)
+
+    def results(self, rules_version=None):
+        '''
+        Method to get the stored result of each document for a rule version.
+        Input: rules_version (str or None for default_rules_version())
+        Output: generator of (doc_id, info_found); documents not evaluated with this rule version are skipped
+        '''
+        if rules_version is None: rules_version = default_rules_version()
+        query = ('SELECT documents.doc_id, results.info_found FROM documents JOIN results '
+                 'ON results.text_hash = documents.text_hash AND results.rules_version = ? ORDER BY documents.doc_id')
+        yield from self.connection.execute(query, (rules_version,))
+
+    def remove_stale(self, rules_version=None):
+        '''
+        Method to delete the results of other rule versions and of texts no document has anymore.
+        Input: rules_version (str or None for default_rules_version()) - version to keep
+        Output: number of deleted results (int)
+        '''
+        if rules_version is None: rules_version = default_rules_version()
+        with self.connection:
+            cursor = self.connection.execute('DELETE FROM results WHERE rules_version != ? OR text_hash NOT IN '
+                                             '(SELECT text_hash FROM documents)', (rules_version,))
+        return cursor.rowcount
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import os
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'results.sqlite')
+    with SalaryResultStore(path) as store:
+        documents = [('a', 'The salary is $30,000.'), ('b', 'The salary is 30,000.'), ('c', 'No salary.'), ('d', 30000),
+                     ('e', 'The salary is $30,000.')]
+        assert store.annotate(documents) == {'documents': 5, 'evaluated': 4, 'reused': 0}
+        assert dict(store.results()) == {'a': 'money_sign_digits', 'b': 'keyword_numbers', 'c': None, 'd': 'input_is_not_string', 'e': 'money_sign_digits'}
+        # Re-run with one changed text: only that text is evaluated
+        documents[2] = ('c', 'Pay: $20/hour.')
+        assert store.annotate(documents, batch_size=2) == {'documents': 5, 'evaluated': 1, 'reused': 4}
+        assert dict(store.results())['c'] == 'money_sign_digits'
+        # New rule version: everything is evaluated again
+        counts = store.annotate(documents, function=lambda text: 'x', rules_version='test')
+        assert counts['evaluated'] == 4 and set(dict(store.results('test')).values()) == {'x'}
+        assert store.remove_stale() == 5
+    os.remove(path)
+    print("All tests passed!")
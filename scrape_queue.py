@@ -0,0 +1,242 @@
+# Module with a persistent queue of URLs to scrape, so that a long scraping run can resume after a crash
+#
+# The queue is a SQLite file. Each URL is pending, leased (being scraped by a worker), done, or failed.
+# A lease expires after lease_seconds, so URLs leased by a worker that died go back to the other workers.
+# Several processes can work on the same file at the same time, and stats() can be called from another process while they run.
+#
+# Usage:
+# queue = ScrapeQueue('scrape_queue.sqlite')
+# queue.add(urls)
+# queue.work(lambda url: save(url, get_selenium_response(url)))  # in one or more processes
+# queue.stats()
+
+# Importing libraries
+import os
+import socket
+import sqlite3
+import time
+
+# States of the jobs
+states = ('pending', 'leased', 'done', 'failed')
+
+# Defining classes
+class ScrapeQueue:
+    '''
+    SQLite queue of URLs to scrape.
+
+    Table jobs: url, state, attempts, worker, leased_until, added_at, finished_at, error.
+    A URL that fails goes back to pending until it has been tried max_attempts times, and then it is failed.
+    '''
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode, so that leasing can use BEGIN IMMEDIATE. Wait for other processes instead of failing when the file is locked
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute("CREATE TABLE IF NOT EXISTS jobs (url TEXT PRIMARY KEY, state TEXT NOT NULL DEFAULT 'pending', "
+                                'attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, leased_until REAL, added_at REAL, '
+                                'finished_at REAL, error TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, leased_until)')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, urls):
+        '''
+        Method to add URLs to the queue (URLs already in it, in any state, are ignored).
+        Input: urls (iterable of str)
+        Output: number of URLs added (int)
+        '''
+        now = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = self.connection.executemany('INSERT OR IGNORE INTO jobs (url, added_at) VALUES (?, ?)', ((url, now) for url in urls))
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return cursor.rowcount
+
+    def lease(self, worker, n=1):
+        '''
+        Method to lease URLs: pending URLs and URLs whose lease expired, in the order they were added.
+        URLs whose lease expired after max_attempts attempts (e.g., they crash the worker every time) are failed instead.
+        Input: worker (str) - id of the worker, n (int) - maximum number of URLs
+        Output: urls (list of str)
+        '''
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock before reading, so two workers never lease the same URL
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute("UPDATE jobs SET state = 'failed', finished_at = ?, leased_until = NULL, error = 'lease expired' "
+                                    "WHERE state = 'leased' AND leased_until < ? AND attempts >= ?", (now, now, self.max_attempts))
+            urls = [row[0] for row in self.connection.execute(
+                "SELECT url FROM jobs WHERE state = 'pending' OR (state = 'leased' AND leased_until < ?) ORDER BY rowid LIMIT ?", (now, n))]
+            self.connection.executemany("UPDATE jobs SET state = 'leased', attempts = attempts + 1, worker = ?, leased_until = ? WHERE url = ?",
+                                        [(worker, now + self.lease_seconds, url) for url in urls])
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return urls
+
+    def extend(self, url, worker):
+        '''
+        Method to extend the lease of a URL (for jobs that take longer than lease_seconds).
+        Output: True if the worker still had the lease
+        '''
+        cursor = self.connection.execute("UPDATE jobs SET leased_until = ? WHERE url = ? AND state = 'leased' AND worker = ?",
+                                         (time.time() + self.lease_seconds, url, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, url, worker):
+        '''
+        Method to mark a leased URL as done.
+        Output: True if the worker still had the lease (False if it expired and another worker took the URL)
+        '''
+        cursor = self.connection.execute("UPDATE jobs SET state = 'done', finished_at = ?, error = NULL WHERE url = ? AND state = 'leased' AND worker = ?",
+                                         (time.time(), url, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, url, worker, error=None):
+        '''
+        Method to record a failed attempt: the URL goes back to pending, or to failed after max_attempts attempts.
+        Output: True if the worker still had the lease
+        '''
+        cursor = self.connection.execute("UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                                         "finished_at = ?, leased_until = NULL, error = ? WHERE url = ? AND state = 'leased' AND worker = ?",
+                                         (self.max_attempts, time.time(), None if error is None else str(error), url, worker))
+        return cursor.rowcount == 1
+
+    def retry_failed(self):
+        '''
+        Method to put the failed URLs back in the queue with their attempts reset.
+        Output: number of URLs (int)
+        '''
+        return self.connection.execute("UPDATE jobs SET state = 'pending', attempts = 0 WHERE state = 'failed'").rowcount
+
+    def has_unfinished(self):
+        '''
+        Method to check whether some URL is still pending or leased (maybe by another worker).
+        Output: bool
+        '''
+        return self.connection.execute("SELECT 1 FROM jobs WHERE state IN ('pending', 'leased') LIMIT 1").fetchone() is not None
+
+    def stats(self, window=300):
+        '''
+        Method to get the progress of the queue.
+        Input: window (float) - seconds over which the recent throughput is computed
+        Output: stats (dict) with the number of URLs in each state, expired leases, and throughput
+        (URLs finished per minute over the last window seconds, and since the first URL finished)
+        '''
+        now = time.time()
+        stats = {state: 0 for state in states}
+        stats.update(self.connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+        stats['expired_leases'] = self.connection.execute("SELECT COUNT(*) FROM jobs WHERE state = 'leased' AND leased_until < ?", (now,)).fetchone()[0]
+        recent = self.connection.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('done', 'failed') AND finished_at >= ?", (now - window,)).fetchone()[0]
+        stats['recent_per_minute'] = recent * 60 / window
+        first, finished = self.connection.execute("SELECT MIN(finished_at), COUNT(*) FROM jobs WHERE state IN ('done', 'failed')").fetchone()
+        stats['overall_per_minute'] = finished * 60 / (now - first) if finished and now > first else 0.0
+        return stats
+
+    def work(self, handler, worker=None, batch_size=1, stop_when_empty=True, poll_seconds=5):
+        '''
+        Method to scrape URLs from the queue until it is empty.
+        Input: handler (callable taking a URL; it fails if it raises or returns None, like get_selenium_response),
+        worker (str or None for host:pid), batch_size (int) - URLs leased at a time (keep it small compared to lease_seconds),
+        stop_when_empty (bool) - otherwise wait poll_seconds for new URLs, poll_seconds (float)
+        Output: counts (dict) with done and failed attempts of this worker
+        '''
+        if worker is None: worker = f"{socket.gethostname()}:{os.getpid()}"
+        counts = {'done': 0, 'failed': 0}
+        while True:
+            urls = self.lease(worker, batch_size)
+            if not urls:
+                # Stop when nothing is pending or leased by a live worker
+                if stop_when_empty and not self.has_unfinished():
+                    return counts
+                time.sleep(poll_seconds)
+                continue
+            for url in urls:
+                try:
+                    result = handler(url)
+                    error = None if result is not None else 'handler returned None'
+                except Exception as e:
+                    error = repr(e)
+                if error is None:
+                    self.complete(url, worker)
+                    counts['done'] += 1
+                else:
+                    self.fail(url, worker, error)
+                    counts['failed'] += 1
+
+def _test_worker(path, output_path):
+    # Worker process for the tests: records the URLs it scraped
+    def handler(url):
+        with open(output_path, 'a') as f:
+            f.write(url + '\n')
+        return 'ok'
+    with ScrapeQueue(path) as queue:
+        queue.work(handler, batch_size=3)
+
+if __name__ == '__main__':
+    print("Running script as main...")
+    import multiprocessing
+    import tempfile
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'queue.sqlite')
+    with ScrapeQueue(path, lease_seconds=60, max_attempts=2) as queue:
+        assert queue.add(['a', 'b', 'c', 'd']) == 4
+        assert queue.add(['a', 'e']) == 1
+        assert queue.lease('w1', 2) == ['a', 'b']
+        assert queue.lease('w2', 2) == ['c', 'd']
+        assert queue.complete('a', 'w1') and not queue.complete('c', 'w1')
+        # Failed attempts go back to pending until max_attempts
+        assert queue.fail('b', 'w1', 'timeout')
+        assert queue.lease('w1', 5) == ['b', 'e']
+        assert queue.fail('b', 'w1', 'timeout')
+        stats = queue.stats()
+        assert (stats['pending'], stats['leased'], stats['done'], stats['failed']) == (0, 3, 1, 1)
+        # A worker that crashed: its leases expire and go to the next worker
+        queue.lease_seconds = 0
+        assert queue.lease('w3', 5) == []
+        queue.connection.execute("UPDATE jobs SET leased_until = 0 WHERE worker = 'w2'")
+        assert queue.stats()['expired_leases'] == 2
+        assert queue.lease('w3', 5) == ['c', 'd']
+        assert not queue.complete('c', 'w2')
+        assert queue.retry_failed() == 1
+    os.remove(path)
+    # A URL that kills its worker every time is failed after max_attempts leases, and work ends
+    with ScrapeQueue(path, lease_seconds=60, max_attempts=3) as queue:
+        queue.add(['crash'])
+        for _ in range(3):
+            assert queue.lease('w', 1) == ['crash']
+            queue.connection.execute("UPDATE jobs SET leased_until = 0")
+        assert queue.lease('w', 1) == []
+        assert queue.connection.execute("SELECT state, attempts, error FROM jobs").fetchone() == ('failed', 3, 'lease expired')
+        assert not queue.has_unfinished()
+        assert queue.work(lambda url: 'ok') == {'done': 0, 'failed': 0}
+    os.remove(path)
+    # Several processes on the same queue: every URL is scraped exactly once
+    output_path = os.path.join(directory, 'scraped.txt')
+    urls = [f'https://example.com/job/{i}' for i in range(300)]
+    with ScrapeQueue(path) as queue:
+        queue.add(urls)
+    processes = [multiprocessing.Process(target=_test_worker, args=(path, output_path)) for _ in range(4)]
+    for process in processes: process.start()
+    for process in processes: process.join()
+    with open(output_path) as f:
+        assert sorted(f.read().split()) == sorted(urls)
+    with ScrapeQueue(path) as queue:
+        stats = queue.stats()
+        assert stats['done'] == 300 and stats['overall_per_minute'] > 0
+        print(stats)
+    print("All tests passed!")
@@ -4,57 +4,931 @@
 
 # Importing libraries
 from selenium import webdriver
-from time import sleep
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+import atexit
+import copy
+import re
+import shutil
+import tempfile
+import threading
+from time import sleep, monotonic, perf_counter
+from urllib.parse import urljoin, urlsplit
+import psutil
 
 # Setting user agent
 my_user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-# Defining function
-def get_selenium_response(url, headless=True):
+# Chrome flags of the fast launch profile: no extensions, background networking, sync, component updates, first-run tasks...
+# https://peter.sh/experiments/chromium-command-line-switches/
+fast_launch_arguments = ['--disable-extensions', '--disable-background-networking', '--disable-sync', '--disable-component-update',
+                         '--disable-default-apps', '--no-first-run', '--no-default-browser-check', '--disable-breakpad',
+                         '--disable-client-side-phishing-detection', '--disable-domain-reliability', '--metrics-recording-only',
+                         '--disable-features=Translate,OptimizationHints,MediaRouter', '--mute-audio']
+
+# Words that show that the posting has rendered (see text_contains_keywords)
+job_keywords = ['responsibilities', 'qualifications', 'requirements', 'duties', 'position', 'salary', 'apply']
+
+# Script that returns true if the text of the page and of its same-origin iframes (the others cannot be read from the page)
+# is at least arguments[1] characters long and contains one of the lowercase keywords in arguments[0]
+_keywords_script = """
+var texts = [document.body ? document.body.innerText : ''];
+var frames = document.querySelectorAll('iframe');
+for (var i = 0; i < frames.length; i++) {
+    try { var doc = frames[i].contentDocument; if (doc && doc.body) texts.push(doc.body.innerText); } catch (e) {}
+}
+var text = texts.join('\\n');
+if (text.length < arguments[1]) return false;
+if (arguments[0].length == 0) return true;
+text = text.toLowerCase();
+for (var j = 0; j < arguments[0].length; j++) {
+    if (text.indexOf(arguments[0][j]) >= 0) return true;
+}
+return false;
+"""
+
+# Script that returns true if a CSS selector matches in the page or in its same-origin iframes
+_selector_script = """
+if (document.querySelector(arguments[0])) return true;
+var frames = document.querySelectorAll('iframe');
+for (var i = 0; i < frames.length; i++) {
+    try { var doc = frames[i].contentDocument; if (doc && doc.querySelector(arguments[0])) return true; } catch (e) {}
+}
+return false;
+"""
+
+# Pattern for source code with only tags and no text (e.g., an about:blank iframe that no script wrote to)
+_empty_document_pattern = re.compile(r'\s*(?:<[^>]*>\s*)*')
+
+# Hosts of vendors that embed postings in iframes (subdomains included)
+frame_hosts = ['icims.com', 'myworkdayjobs.com', 'workday.com', 'interfolio.com', 'taleo.net', 'peopleadmin.com',
+               'ultipro.com', 'ukg.com', 'jobvite.com', 'greenhouse.io', 'lever.co', 'smartrecruiters.com',
+               'applytojob.com', 'paylocity.com', 'oraclecloud.com', 'silkroad.com', 'governmentjobs.com']
+
+# Defining functions
+def get_chrome_options(headless=True):
+    '''
+    Function to build the Chrome options used by the scraper.
+
+    Inputs:
+    - headless: If True, run the browser in headless mode.
+
+    Output:
+    - options: webdriver.ChromeOptions.
+
+    Dependencies:
+    - from selenium import webdriver
+    '''
+    # Setting options https://www.selenium.dev/documentation/webdriver/drivers/options/
+    options = webdriver.ChromeOptions()
+    # Ask browser to ignore SSL errors
+    # I think equivalent to options.add_argument('ignore-certificate-errors')
+    options.accept_insecure_certs = True
+    # Add user agent https://www.zenrows.com/blog/user-agent-web-scraping#best
+    options.add_argument(f"--user-agent={my_user_agent}")
+    # Add headless option
+    if headless: options.add_argument('--headless')
+    return options
+
+def get_fast_chrome_options(headless=True, profile_template=None, disk_cache_dir=None, block_images=True):
+    '''
+    Function to build Chrome options that launch faster: get_chrome_options plus fast_launch_arguments, no images,
+    a disk cache shared between launches, and a copy of a preinitialized profile (see create_profile_template).
+
+    Inputs:
+    - headless: If True, run the browser in headless mode.
+    - profile_template: Optional directory with a profile to copy as the user data directory.
+    - disk_cache_dir: Optional directory for the disk cache (shared between launches).
+    - block_images: If True, do not load images.
+
+    Output:
+    - options: webdriver.ChromeOptions.
+    - user_data_dir: copy of profile_template (delete it after quitting the driver), or None.
+
+    Dependencies:
+    - get_chrome_options
+    - import shutil
+    - import tempfile
+    '''
+    options = get_chrome_options(headless)
+    for argument in fast_launch_arguments:
+        options.add_argument(argument)
+    if block_images:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    if disk_cache_dir is not None: options.add_argument(f'--disk-cache-dir={disk_cache_dir}')
+    user_data_dir = None
+    if profile_template is not None:
+        # Each browser needs its own user data directory (Chrome locks it)
+        user_data_dir = tempfile.mkdtemp(prefix='chrome-profile-')
+        shutil.copytree(profile_template, user_data_dir, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns('Singleton*', '*Cache*', 'Crashpad'))
+        options.add_argument(f'--user-data-dir={user_data_dir}')
+    return options, user_data_dir
+
+def create_profile_template(path, headless=True):
+    '''
+    Function to create a minimal profile to use as profile_template: Chrome is launched once with the fast
+    launch profile, so the first-run files are already there when it is copied.
+
+    Inputs:
+    - path: Directory for the profile (created if needed).
+    - headless: If True, run the browser in headless mode.
+
+    Output:
+    - path.
+
+    Dependencies:
+    - from selenium import webdriver
+    - get_fast_chrome_options
+    '''
+    options, _ = get_fast_chrome_options(headless)
+    options.add_argument(f'--user-data-dir={path}')
+    driver = webdriver.Chrome(options = options)
+    try:
+        driver.get('about:blank')
+    finally:
+        driver.quit()
+    return path
+
+def is_content_frame(frame_url, page_url, frame_hosts=frame_hosts):
+    '''
+    Function to decide if an iframe may contain the posting: same origin as the page, no URL or about:blank (inline content),
+    or a host of a known vendor (not ads, videos, maps...).
+
+    Inputs:
+    - frame_url: src of the iframe.
+    - page_url: URL of the page.
+    - frame_hosts: hosts of vendors that embed postings in iframes.
+
+    Output:
+    - True or False.
+
+    Dependencies:
+    - from urllib.parse import urljoin, urlsplit
+    '''
+    # Inline content (no src, srcdoc, about:blank written by a script, or javascript:) is from the page itself
+    # (get_page_source skips the inline frames without text)
+    if not frame_url or frame_url.startswith(('about:', 'javascript:')): return True
+    frame_parts = urlsplit(urljoin(page_url, frame_url))
+    page_parts = urlsplit(page_url)
+    if (frame_parts.scheme, frame_parts.netloc) == (page_parts.scheme, page_parts.netloc): return True
+    host = frame_parts.hostname or ''
+    return any(host == vendor or host.endswith('.' + vendor) for vendor in frame_hosts)
+
+def get_page_source(driver, url, frame_hosts=frame_hosts, max_depth=2):
+    '''
+    Function to get the source code of the page and of the iframes that may contain the posting, merged into one document.
+    The source code of each frame is added after the one of the page, between <!-- frame: src --> and <!-- end frame: src -->.
+
+    Inputs:
+    - driver: Selenium webdriver, with the page loaded (in the top document).
+    - url: URL of the page.
+    - frame_hosts: hosts of vendors that embed postings in iframes.
+    - max_depth: how many levels of nested iframes to follow.
+
+    Output:
+    - response: source code (str).
+
+    Dependencies:
+    - from selenium.webdriver.common.by import By
+    - is_content_frame
+    '''
+    sources = [driver.page_source]
+    # Errors in the frames do not lose what was already read
+    try:
+        _collect_frames(driver, url, frame_hosts, max_depth, sources)
+    except Exception:
+        pass
+    return '\n'.join(sources)
+
+def _collect_frames(driver, url, frame_hosts, depth, sources):
+    if depth <= 0: return
+    # Dealing with iframes (e.g., ICIMS puts the posting in icims_content_iframe)
+    # https://www.selenium.dev/documentation/webdriver/interactions/frames/
+    # This seems to behave differently if operating in headless mode or not!!!
+    for frame in driver.find_elements(By.TAG_NAME, 'iframe'):
+        try:
+            frame_url = frame.get_attribute('src') or ''
+            if not is_content_frame(frame_url, url, frame_hosts): continue
+            driver.switch_to.frame(frame)
+        except Exception:
+            # Frame removed from the page in the meantime
+            continue
+        # A frame can be detached or reloaded while it is read: skip it and keep the rest
+        try:
+            source = driver.page_source
+        except Exception:
+            source = None
+        if source is not None:
+            inline = not frame_url or frame_url.startswith(('about:', 'javascript:'))
+            # Empty inline frames (e.g., about:blank that no script wrote to) add nothing, but their frames may
+            if not (inline and _empty_document_pattern.fullmatch(source)):
+                # '--' cannot be in a comment
+                marker = frame_url.replace('--', '%2D%2D')
+                sources.extend([f'<!-- frame: {marker} -->', source, f'<!-- end frame: {marker} -->'])
+            try:
+                _collect_frames(driver, url if inline else urljoin(url, frame_url), frame_hosts, depth - 1, sources)
+            except Exception:
+                pass
+        try:
+            driver.switch_to.parent_frame()
+        except Exception:
+            # The frame is gone: go back to the top document, where the remaining frames of this level cannot be reached
+            driver.switch_to.default_content()
+            return
+
+def text_contains_keywords(keywords=job_keywords, min_length=500):
+    '''
+    Function to build a content-ready predicate: the text of the page is at least min_length characters long
+    and contains one of the keywords (in any case).
+
+    Inputs:
+    - keywords: list of words (any of them is enough; an empty list only checks the length).
+    - min_length: minimum number of characters of text.
+
+    Output:
+    - ready: function that takes the driver and returns True or False (as the conditions of WebDriverWait).
+    '''
+    keywords = [keyword.lower() for keyword in keywords]
+    def ready(driver):
+        # One round trip, and only a boolean comes back: the text is checked in the browser
+        return bool(driver.execute_script(_keywords_script, keywords, min_length))
+    return ready
+
+def selector_present(selector):
+    '''
+    Function to build a content-ready predicate: an element matching a CSS selector is in the page
+    (e.g., '.iCIMS_JobContent' or '[data-automation-id="jobPostingDescription"]').
+
+    Inputs:
+    - selector: CSS selector.
+
+    Output:
+    - ready: function that takes the driver and returns True or False (as the conditions of WebDriverWait).
+    '''
+    def ready(driver):
+        return bool(driver.execute_script(_selector_script, selector))
+    return ready
+
+def wait_until_ready(driver, ready, wait=10, poll=0.25):
+    '''
+    Function to wait until a content-ready predicate holds, or at most wait seconds.
+    Predicates can be combined with selenium.webdriver.support.expected_conditions.any_of and all_of.
+
+    Inputs:
+    - driver: Selenium webdriver.
+    - ready: predicate (e.g., from text_contains_keywords or selector_present), or None to wait the whole time.
+    - wait: maximum number of seconds.
+    - poll: seconds between checks.
+
+    Output:
+    - True if the predicate held, False if the time ran out.
+
+    Dependencies:
+    - from selenium.webdriver.support.ui import WebDriverWait
+    - from selenium.common.exceptions import TimeoutException, WebDriverException
+    - from time import sleep
+    '''
+    if ready is None:
+        sleep(wait)
+        return False
+    try:
+        # The page may still be navigating or redirecting (page load strategy 'eager'): scripts that fail count as not ready
+        WebDriverWait(driver, wait, poll_frequency=poll, ignored_exceptions=(WebDriverException,)).until(ready)
+        return True
+    except TimeoutException:
+        return False
+
+def get_selenium_response(url, headless=True, browser=None, fast=False, profile_template=None, disk_cache_dir=None, timeout=None, options=None, ready=None, wait=10, timings=None):
     '''
     Function to scrape a website using Selenium.
 
     Inputs:
     - url: URL of the website to scrape.
     - headless: If True, run the browser in headless mode.
+    - browser: Optional SharedBrowser. If given, the page is loaded in a fresh context of that browser
+      instead of launching a new one (headless is then ignored).
+    - fast: If True, launch Chrome with get_fast_chrome_options (no images).
+    - profile_template, disk_cache_dir: passed to get_fast_chrome_options if fast is True.
+    - timeout: Optional page load timeout in seconds (e.g., from host_stats.HostPolicy.timeout).
+    - options: Optional webdriver.ChromeOptions to use instead of the ones from headless and fast (e.g., replay.replay_chrome_options).
+    - ready: Optional content-ready predicate (e.g., text_contains_keywords()). If given, the page is read as soon as it holds,
+      and driver.get returns once the document is parsed (page load strategy 'eager') instead of waiting for every image and script.
+    - wait: Seconds to wait for the page to render (at most, if ready is given).
+    - timings: Optional dict. timings['navigation'] is set to the seconds driver.get took, even if it timed out
+      (without the launch of Chrome and the wait; e.g., for host_stats.HostPolicy). Not set if browser is given.
 
     Output:
     - response: HTML response of the website.
 
     Dependencies:
     - from selenium import webdriver
-    - from time import sleep
+    - wait_until_ready
+    - get_page_source
+    - quit_driver
     '''
+    if browser is not None:
+        return browser.get(url)
+    driver = None
+    user_data_dir = None
     try:
-        # Setting options https://www.selenium.dev/documentation/webdriver/drivers/options/
-        options = webdriver.ChromeOptions()
-        # Ask browser to ignore SSL errors
-        # I think equivalent to options.add_argument('ignore-certificate-errors')
-        options.accept_insecure_certs = True
-        # Add user agent https://www.zenrows.com/blog/user-agent-web-scraping#best
-        options.add_argument(f"--user-agent={my_user_agent}")
-        # Add headless option
-        if headless: options.add_argument('--headless')
         # Create driver
+        if options is None and fast:
+            options, user_data_dir = get_fast_chrome_options(headless, profile_template, disk_cache_dir)
+        elif options is None:
+            options = get_chrome_options(headless)
+        if ready is not None and options.page_load_strategy == 'normal':
+            # The predicate does the waiting
+            options = copy.deepcopy(options)
+            options.page_load_strategy = 'eager'
         driver = webdriver.Chrome(options = options)
+        browser_supervisor.register(driver)
+        if timeout is not None: driver.set_page_load_timeout(timeout)
         # Get URL
-        driver.get(url)
-        # Dealing with iframes for ICMS
-        # Switch to iframe
-        # https://www.selenium.dev/documentation/webdriver/interactions/frames/
-        # This seems to behave differently if operating in headless mode or not!!!
-        if 'icims.com' in url: driver.switch_to.frame('icims_content_iframe')
-        # Since sleep() worked for Interfolio, I'll add some wait for every case. I don't care much about speed, so might as well...
-        sleep(10)
-        # Get response
-        response = driver.page_source
-        # Close driver
-        driver.quit()
+        start = perf_counter()
+        try:
+            driver.get(url)
+        finally:
+            if timings is not None: timings['navigation'] = perf_counter() - start
+        # Since sleep() worked for Interfolio, I'll add some wait for every case (until the posting is there if ready is given)
+        wait_until_ready(driver, ready, wait)
+        # Get response (page and iframes with the posting, if any)
+        response = get_page_source(driver, url)
+        browser_supervisor.page_served()
         # Return response
         return response
     # If it doesn't work, return None
     except Exception:
         return None
+    finally:
+        # Close driver, even if something failed (otherwise Chrome and chromedriver keep running)
+        if driver is not None: quit_driver(driver)
+        if user_data_dir is not None: shutil.rmtree(user_data_dir, ignore_errors=True)
+
+def kill_processes(processes, timeout=3):
+    '''
+    Function to terminate processes, and kill the ones that are still running after timeout seconds.
+
+    Inputs:
+    - processes: list of psutil.Process.
+    - timeout: seconds to wait after terminating.
+
+    Output:
+    - Number of processes that were running.
+
+    Dependencies:
+    - import psutil
+    '''
+    running = []
+    for process in processes:
+        try:
+            process.terminate()
+            running.append(process)
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(running, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(alive, timeout=timeout)
+    return len(running)
+
+def quit_driver(driver, supervisor=None):
+    '''
+    Function to close a driver, and to kill its chromedriver and Chrome processes if quit did not close them.
+
+    Inputs:
+    - driver: Selenium webdriver.
+    - supervisor: BrowserSupervisor the driver is registered with (default: browser_supervisor).
+
+    Dependencies:
+    - BrowserSupervisor
+    '''
+    if supervisor is None: supervisor = browser_supervisor
+    # Record the helper processes Chrome started since the last look, so that they are reaped too if quit fails
+    supervisor.refresh()
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    supervisor.unregister(driver)
+    supervisor.reap()
+
+# Defining classes
+class BrowserSupervisor:
+    '''
+    Tracker of the chromedriver and Chrome processes of the drivers of this process.
+
+    Registered drivers have their process trees recorded every time the supervisor looks at them. Once a driver is
+    unregistered (quit_driver does it), any of its processes still running is an orphan, and reap kills it. Processes are
+    identified by PID and creation time, so a reused PID is never killed. get_selenium_response and SharedBrowser use
+    the module's browser_supervisor, which also closes every browser when Python exits.
+
+    health() gives the metrics of the worker: live browsers, processes, their memory, pages served, and processes reaped.
+    '''
+
+    def __init__(self):
+        self._drivers = {}
+        self._processes = {}
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.reaped = 0
+
+    def register(self, driver):
+        '''
+        Method to start tracking the processes of a driver.
+        '''
+        with self._lock:
+            self._drivers[id(driver)] = driver
+        self.refresh()
+
+    def unregister(self, driver):
+        '''
+        Method to stop tracking a driver (its processes are reaped if they keep running).
+        '''
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+
+    def page_served(self, n=1):
+        with self._lock:
+            self.pages += n
+
+    def refresh(self):
+        '''
+        Method to record the current processes of the registered drivers (Chrome starts helper processes over time).
+        '''
+        with self._lock:
+            drivers = list(self._drivers.items())
+        for driver_id, driver in drivers:
+            try:
+                root = psutil.Process(driver.service.process.pid)
+                processes = [root] + root.children(recursive=True)
+            except (AttributeError, psutil.Error):
+                continue
+            for process in processes:
+                try:
+                    key = (process.pid, process.create_time())
+                except psutil.Error:
+                    continue
+                with self._lock:
+                    self._processes[key] = (process, driver_id)
+
+    def _alive(self):
+        # Tracked processes still running (the others are forgotten)
+        alive = []
+        with self._lock:
+            for key, (process, driver_id) in list(self._processes.items()):
+                try:
+                    if process.is_running() and process.status() != psutil.STATUS_ZOMBIE:
+                        alive.append((process, driver_id))
+                        continue
+                except psutil.Error:
+                    pass
+                del self._processes[key]
+        return alive
+
+    def reap(self, timeout=3):
+        '''
+        Method to kill the processes of drivers that are not registered anymore.
+        Output: number of processes killed
+        '''
+        self.refresh()
+        with self._lock:
+            registered = set(self._drivers)
+        orphans = [process for process, driver_id in self._alive() if driver_id not in registered]
+        killed = kill_processes(orphans, timeout) if orphans else 0
+        with self._lock:
+            self.reaped += killed
+        self._alive()
+        return killed
+
+    def health(self):
+        '''
+        Method to get the health metrics of this worker.
+        Output: dict with live_browsers, processes, rss_mb, pages_served, and reaped
+        '''
+        self.refresh()
+        alive = self._alive()
+        rss = 0
+        for process, _ in alive:
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        with self._lock:
+            live_browsers = sum(1 for driver_id in self._drivers if any(owner == driver_id for _, owner in alive))
+            return {'live_browsers': live_browsers, 'processes': len(alive), 'rss_mb': rss / 2**20,
+                    'pages_served': self.pages, 'reaped': self.reaped}
+
+    def shutdown(self):
+        '''
+        Method to close all the registered drivers and kill all their processes.
+        '''
+        with self._lock:
+            drivers = list(self._drivers.values())
+        for driver in drivers:
+            quit_driver(driver, self)
+        self.reap()
+
+# Supervisor of the browsers of this process
+browser_supervisor = BrowserSupervisor()
+atexit.register(browser_supervisor.shutdown)
+
+class SharedBrowser:
+    '''
+    One long-lived Chrome that serves many URLs, each in its own browser context (like an incognito window,
+    with its own cookies and storage). Contexts are disposed as soon as their page has been read.
+
+    get_many loads a batch of URLs in parallel contexts and waits once for all of them, so a single browser
+    fetches several pages at the same time. With a content-ready predicate (ready), each page is read as soon
+    as it holds, and the others are read after wait seconds. Between batches, the browser is restarted if the memory (RSS) of
+    Chrome and its helper processes is above max_rss_mb, or after max_pages pages, before it leaks too much.
+
+    options (webdriver.ChromeOptions, e.g., replay.replay_chrome_options) replaces get_chrome_options(headless).
+    A copy of them is used, with page_load_strategy 'none'.
+
+    Usage:
+    with SharedBrowser() as browser:
+        responses = browser.get_many(urls)
+        response = get_selenium_response(url, browser=browser)
+    '''
+
+    def __init__(self, headless=True, max_rss_mb=2048, max_pages=500, batch_size=8, wait=10, ready=None, poll=0.25, options=None):
+        self.headless = headless
+        self.options = options
+        self.max_rss_mb = max_rss_mb
+        self.max_pages = max_pages
+        self.batch_size = batch_size
+        self.wait = wait
+        self.ready = ready
+        self.poll = poll
+        self.driver = None
+        self.pages_served = 0
+        self.restarts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.quit()
+
+    def start(self):
+        '''
+        Method to launch the browser.
+        '''
+        options = copy.deepcopy(self.options) if self.options is not None else get_chrome_options(self.headless)
+        # Do not wait for the page to load in driver.get, so that several contexts load at the same time
+        options.page_load_strategy = 'none'
+        # Contexts are created with WebDriver BiDi, which talks to the browser (CDP commands go to the current tab, which may not create them)
+        options.enable_bidi = True
+        self.driver = webdriver.Chrome(options = options)
+        browser_supervisor.register(self.driver)
+        # Window of the default context, to come back to after closing the others
+        self.main_window = self.driver.current_window_handle
+        self.pages_served = 0
+
+    def quit(self):
+        '''
+        Method to close the browser.
+        '''
+        if self.driver is not None:
+            quit_driver(self.driver)
+            self.driver = None
+
+    def restart(self):
+        '''
+        Method to close the browser and launch a new one.
+        '''
+        self.quit()
+        self.start()
+        self.restarts += 1
+
+    def rss_mb(self):
+        '''
+        Method to get the memory (RSS, in MB) of chromedriver, Chrome, and all their helper processes.
+        '''
+        if self.driver is None:
+            return 0
+        try:
+            process = psutil.Process(self.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+        except (AttributeError, psutil.Error):
+            return 0
+        rss = 0
+        for process in processes:
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss / 2**20
+
+    def _check_health(self):
+        if self.driver is None:
+            self.start()
+        elif self.pages_served >= self.max_pages or self.rss_mb() > self.max_rss_mb:
+            self.restart()
+
+    def _open_context(self, url):
+        # New user context (a browser context in Chrome) and a tab in it https://w3c.github.io/webdriver-bidi/#module-browser
+        context_id = self.driver.browser.create_user_context()
+        try:
+            # In chromedriver, BiDi browsing contexts are window handles
+            window = self.driver.browsing_context.create(type='tab', user_context=context_id)
+            self.driver.switch_to.window(window)
+            self.driver.get(url)
+        except Exception:
+            self._close_context(context_id, None)
+            raise
+        return context_id, window
+
+    def _close_context(self, context_id, window):
+        if window is not None:
+            try:
+                self.driver.browsing_context.close(window)
+            except Exception:
+                pass
+        try:
+            # Closes the tabs still open in it too
+            self.driver.browser.remove_user_context(context_id)
+        except Exception:
+            pass
+
+    def _read_context(self, url, context):
+        # Read the page and close the context
+        response = None
+        try:
+            self.driver.switch_to.window(context[1])
+            response = get_page_source(self.driver, url)
+        except Exception:
+            pass
+        self._close_context(*context)
+        return response
+
+    def get_many(self, urls):
+        '''
+        Method to scrape several URLs, batch_size at a time.
+
+        Inputs:
+        - urls: list of URLs.
+
+        Output:
+        - responses: list with the HTML response of each URL (None if it did not work).
+        '''
+        responses = []
+        for start in range(0, len(urls), self.batch_size):
+            responses.extend(self._get_batch(urls[start:start + self.batch_size]))
+        return responses
+
+    def get(self, url):
+        '''
+        Method to scrape one URL in a fresh context.
+
+        Inputs:
+        - url: URL of the website to scrape.
+
+        Output:
+        - response: HTML response of the website (None if it did not work).
+        '''
+        return self._get_batch([url])[0]
+
+    def _get_batch(self, urls):
+        try:
+            self._check_health()
+        except Exception:
+            return [None] * len(urls)
+        # Open a context per URL and start loading
+        contexts = []
+        for url in urls:
+            try:
+                contexts.append(self._open_context(url))
+            except Exception:
+                contexts.append(None)
+        responses = [None] * len(urls)
+        pending = [i for i, context in enumerate(contexts) if context is not None]
+        if self.ready is None:
+            # Same wait as get_selenium_response, but once for the whole batch
+            sleep(self.wait)
+        else:
+            # Read each page as soon as it is ready
+            deadline = monotonic() + self.wait
+            while pending and monotonic() < deadline:
+                for i in list(pending):
+                    try:
+                        self.driver.switch_to.window(contexts[i][1])
+                        is_ready = self.ready(self.driver)
+                    except Exception:
+                        is_ready = False
+                    if is_ready:
+                        responses[i] = self._read_context(urls[i], contexts[i])
+                        pending.remove(i)
+                if pending: sleep(self.poll)
+        # Read the other pages
+        for i in pending:
+            responses[i] = self._read_context(urls[i], contexts[i])
+        self.pages_served += len(urls)
+        browser_supervisor.page_served(len(urls))
+        try:
+            self.driver.switch_to.window(self.main_window)
+        except Exception:
+            # The browser is not responding: start a new one for the next batch
+            self.quit()
+        return responses
 
 if __name__ == '__main__':
+    from selenium.common.exceptions import JavascriptException
+    # Frames that may contain the posting
+    assert is_content_frame('https://careers-x.icims.com/jobs/1/job?in_iframe=1', 'https://careers-x.icims.com/jobs/1/job')
+    assert is_content_frame('https://x.wd1.myworkdayjobs.com/job/1', 'https://jobs.university.edu/posting/1')
+    assert is_content_frame('/posting/1/details', 'https://jobs.university.edu/posting/1')
+    assert is_content_frame('', 'https://jobs.university.edu/posting/1')
+    assert is_content_frame('about:blank', 'https://jobs.university.edu/posting/1')
+    assert not is_content_frame('https://www.youtube.com/embed/1', 'https://jobs.university.edu/posting/1')
+    assert not is_content_frame('https://notgreenhouse.io/embed', 'https://jobs.university.edu/posting/1')
+    # Frames that fail while they are read are skipped, and the rest of the page is kept
+    class FrameDriver:
+        # Stand-in for a driver on a page with frames: each frame is (src, source or an exception, frames)
+        def __init__(self, page):
+            self.stack = [page]
+            driver = self
+            class SwitchTo:
+                def frame(self, frame):
+                    driver.stack.append(frame.page)
+                def parent_frame(self):
+                    if driver.stack[-1][0] == 'gone': raise RuntimeError('No such frame')
+                    # As in Selenium, nothing happens in the top document
+                    if len(driver.stack) > 1: driver.stack.pop()
+                def default_content(self):
+                    del driver.stack[1:]
+            self.switch_to = SwitchTo()
+        @property
+        def page_source(self):
+            if isinstance(self.stack[-1][1], Exception): raise self.stack[-1][1]
+            return self.stack[-1][1]
+        def find_elements(self, by, value):
+            return [type('Frame', (), {'page': frame, 'get_attribute': lambda self, name, src=frame[0]: src})() for frame in self.stack[-1][2]]
+    page = ('', '<p>Top</p>', [('/detached', RuntimeError('Detached'), []), ('', '<p>Inline</p>', [('gone', '<p>Gone</p>', [])]),
+                               ('/posting', '<p>Posting</p>', [])])
+    assert get_page_source(FrameDriver(page), 'https://jobs.university.edu/posting/1') == '\n'.join([
+        '<p>Top</p>', '<!-- frame:  -->', '<p>Inline</p>', '<!-- end frame:  -->', '<!-- frame: gone -->', '<p>Gone</p>', '<!-- end frame: gone -->',
+        '<!-- frame: /posting -->', '<p>Posting</p>', '<!-- end frame: /posting -->'])
+    # Frames written by a script (about:blank) are kept, unless they have no text (their own frames are still read)
+    page = ('', '<p>Top</p>', [('about:blank', '<html><head></head><body></body></html>', []),
+                               ('about:blank', '<html><body><p>Written</p></body></html>', []),
+                               ('about:blank', '<html><body><iframe></iframe></body></html>', [('/posting', '<p>Nested</p>', [])])])
+    assert get_page_source(FrameDriver(page), 'https://jobs.university.edu/posting/1') == '\n'.join([
+        '<p>Top</p>', '<!-- frame: about:blank -->', '<html><body><p>Written</p></body></html>', '<!-- end frame: about:blank -->',
+        '<!-- frame: /posting -->', '<p>Nested</p>', '<!-- end frame: /posting -->'])
+    # The keywords are checked in the browser: only the arguments go there and only a boolean comes back
+    class ScriptDriver:
+        def execute_script(self, script, *args):
+            self.args = args
+            return True
+    driver = ScriptDriver()
+    assert text_contains_keywords(['Salary'], 100)(driver) is True and driver.args == (['salary'], 100)
+    # Processes of a driver that failed to quit are reaped
+    import subprocess
+    import sys
+    class FakeDriver:
+        # Stand-in for webdriver.Chrome: a "chromedriver" process with a "Chrome" child, and a quit that fails
+        def __init__(self, options=None):
+            self.service = type('Service', (), {})()
+            self.service.process = subprocess.Popen([sys.executable, '-c', 'import subprocess, sys, time; '
+                                                     'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); time.sleep(60)'])
+            sleep(1)
+        def set_page_load_timeout(self, timeout):
+            pass
+        def get(self, url):
+            raise RuntimeError('Page crashed')
+        def quit(self):
+            raise RuntimeError('Browser not responding')
+    driver = FakeDriver()
+    browser_supervisor.register(driver)
+    health = browser_supervisor.health()
+    assert health['live_browsers'] == 1 and health['processes'] == 2 and health['rss_mb'] > 0
+    processes = [psutil.Process(driver.service.process.pid)] + psutil.Process(driver.service.process.pid).children()
+    quit_driver(driver)
+    assert not any(process.is_running() and process.status() != psutil.STATUS_ZOMBIE for process in processes)
+    assert browser_supervisor.health() == {'live_browsers': 0, 'processes': 0, 'rss_mb': 0, 'pages_served': 0, 'reaped': 2}
+    # Helper processes started after the driver was registered are reaped too
+    class LateChildDriver(FakeDriver):
+        def __init__(self, options=None):
+            self.service = type('Service', (), {})()
+            self.service.process = subprocess.Popen([sys.executable, '-c', 'import subprocess, sys, time; time.sleep(1); '
+                                                     'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); time.sleep(60)'])
+    driver = LateChildDriver()
+    browser_supervisor.register(driver)
+    sleep(2)
+    processes = [psutil.Process(driver.service.process.pid)] + psutil.Process(driver.service.process.pid).children()
+    assert len(processes) == 2
+    quit_driver(driver)
+    assert not any(process.is_running() and process.status() != psutil.STATUS_ZOMBIE for process in processes)
+    assert browser_supervisor.reaped == 4
+    # get_selenium_response cleans up when the page fails
+    webdriver.Chrome = FakeDriver
+    timings = {}
+    assert get_selenium_response('https://jobs.university.edu/posting/1', timings=timings) is None
+    # The navigation is timed even when it fails, without the launch of the browser (at least 1 second for FakeDriver)
+    assert 0 <= timings['navigation'] < 0.5
+    assert browser_supervisor.health()['processes'] == 0 and browser_supervisor.reaped == 6
+    # SharedBrowser launches Chrome with a copy of the options it was given
+    launched = []
+    class OptionsDriver(FakeDriver):
+        current_window_handle = 'main'
+        def __init__(self, options=None):
+            super().__init__(options)
+            self.options = options
+            launched.append(self)
+    webdriver.Chrome = OptionsDriver
+    options = get_chrome_options()
+    options.add_argument('--proxy-server=127.0.0.1:8080')
+    browser = SharedBrowser(options=options)
+    browser.start()
+    assert '--proxy-server=127.0.0.1:8080' in browser.driver.options.arguments and browser.driver.options.page_load_strategy == 'none'
+    assert browser.driver.options.enable_bidi and not options.enable_bidi
+    assert options.page_load_strategy == 'normal'
+    browser.quit()
+    # With a content-ready predicate, driver.get does not wait for the whole page to load
+    assert get_selenium_response('https://jobs.university.edu/posting/1', options=options, ready=text_contains_keywords()) is None
+    assert launched[-1].options.page_load_strategy == 'eager' and options.page_load_strategy == 'normal'
+    # Scripts that fail while the page is still navigating do not lose the page
+    class NavigatingDriver(FakeDriver):
+        page_source = '<p>Posting</p>'
+        def __init__(self, options=None):
+            super().__init__(options)
+            self.scripts = 0
+        def get(self, url):
+            pass
+        def execute_script(self, script, *args):
+            self.scripts += 1
+            if self.scripts < 3: raise JavascriptException('Execution context was destroyed')
+            return True
+        def find_elements(self, by, value):
+            return []
+    webdriver.Chrome = NavigatingDriver
+    assert get_selenium_response('https://jobs.university.edu/posting/1', ready=text_contains_keywords(), wait=5) == '<p>Posting</p>'
+    # SharedBrowser: pages read as soon as they are ready or after wait, failed opens, contexts closed, and restarts
+    class ContextDriver:
+        # Stand-in for Chrome with WebDriver BiDi: pages with 'slow' in the URL never get ready, the others after two checks
+        def __init__(self, options=None):
+            self.options = options
+            self.current_window_handle = 'main'
+            self.contexts = set()
+            self.windows = {}
+            self.quit_called = False
+            launched.append(self)
+            driver = self
+            class Browser:
+                def create_user_context(self):
+                    context = f'context-{len(driver.contexts)}-{monotonic()}'
+                    driver.contexts.add(context)
+                    return context
+                def remove_user_context(self, context):
+                    driver.contexts.remove(context)
+                    for window in [window for window, page in driver.windows.items() if page['context'] == context]: del driver.windows[window]
+            class BrowsingContext:
+                def create(self, type, user_context):
+                    window = f'tab-{len(driver.windows)}-{monotonic()}'
+                    driver.windows[window] = {'context': user_context, 'url': 'about:blank', 'checks': 0}
+                    return window
+                def close(self, window):
+                    del driver.windows[window]
+            class SwitchTo:
+                def window(self, window):
+                    if window != 'main' and window not in driver.windows: raise WebDriverException('No such window')
+                    driver.current_window_handle = window
+            self.browser, self.browsing_context, self.switch_to = Browser(), BrowsingContext(), SwitchTo()
+        def get(self, url):
+            if 'fail' in url: raise WebDriverException('Navigation failed')
+            self.windows[self.current_window_handle]['url'] = url
+        def execute_script(self, script, *args):
+            page = self.windows[self.current_window_handle]
+            page['checks'] += 1
+            return 'slow' not in page['url'] and page['checks'] >= 2
+        @property
+        def page_source(self):
+            return f"<p>{self.windows[self.current_window_handle]['url']}</p>"
+        def find_elements(self, by, value):
+            return []
+        def quit(self):
+            self.quit_called = True
+    webdriver.Chrome = ContextDriver
+    launched.clear()
+    with SharedBrowser(batch_size=3, wait=0.5, ready=selector_present('p'), poll=0.01, max_pages=4) as browser:
+        start = monotonic()
+        assert browser.get_many(['https://a.edu/1', 'https://a.edu/fail', 'https://a.edu/slow']) == ['<p>https://a.edu/1</p>', None, '<p>https://a.edu/slow</p>']
+        assert 0.5 <= monotonic() - start < 2 and browser.pages_served == 3
+        assert launched[0].options.enable_bidi and not launched[0].contexts and not launched[0].windows
+        assert browser.get('https://a.edu/2') == '<p>https://a.edu/2</p>' and len(launched) == 1
+        # After max_pages pages, the next batch starts a new browser
+        assert browser.get('https://a.edu/3') == '<p>https://a.edu/3</p>'
+        assert len(launched) == 2 and launched[0].quit_called and browser.restarts == 1 and browser.pages_served == 1
+    assert launched[1].quit_called
+    # Without a predicate, every page is read after wait
+    with SharedBrowser(wait=0) as browser:
+        assert browser.get_many(['https://a.edu/slow', 'https://a.edu/4']) == ['<p>https://a.edu/slow</p>', '<p>https://a.edu/4</p>']
+        assert not launched[-1].contexts and not launched[-1].windows
     print('Module with functions to scrape websites run successfully!')
@@ -0,0 +1,203 @@
+# Module with a content-hash keyed cache in front of extract_text
+
+# Importing libraries
+from collections import OrderedDict
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from text_extractor import extract_text
+
+# Bump this when extract_text changes its output so old cache entries are not reused
+EXTRACTOR_VERSION = '2'
+
+# Defining functions
+def content_hash(html_content):
+    '''
+    Function to compute the cache key of some source code.
+    Input: source code (str, bytes, bytearray, memoryview, or mmap; anything else goes through str, as in extract_text)
+    Output: key (str) - hex SHA-256 of the extractor version, the kind of input, and the content
+    Dependencies: hashlib
+    '''
+    # The kind of input is part of the key: bytes are decoded with their declared charset, so a str and
+    # its UTF-8 bytes can give different text (like salary_store.text_hash)
+    if isinstance(html_content, str):
+        kind, data = b's', html_content.encode('utf-8', 'surrogatepass')
+    elif isinstance(html_content, (bytes, bytearray, memoryview, mmap.mmap)):
+        kind, data = b'b', html_content
+    else:
+        # extract_text applies str to anything else, so the text is the one of the str
+        kind, data = b's', str(html_content).encode('utf-8', 'surrogatepass')
+    hasher = hashlib.sha256(EXTRACTOR_VERSION.encode('ascii') + b'\0' + kind)
+    hasher.update(data)
+    return hasher.hexdigest()
+
+# Defining classes
+class TextCache:
+    '''
+    Cache of extract_text results keyed by the hash of the source code.
+
+    Two levels:
+    - An in-process LRU of at most maxsize entries.
+    - An optional on-disk store (cache_dir) with one file per key. Files are written to a temporary
+      file and moved into place with os.replace, so several worker processes can share the same directory.
+
+    The object can be pickled and sent to worker processes: each process gets its own (empty) LRU and
+    its own hit/miss counters, and shares the on-disk store.
+
+    Usage:
+    cache = TextCache(maxsize=10000, cache_dir='text_cache')
+    text = cache.extract_text(html_content)
+    cache.stats()
+    '''
+
+    def __init__(self, maxsize=10000, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        if cache_dir is not None: os.makedirs(cache_dir, exist_ok=True)
+        self._init_process_state()
+
+    def _init_process_state(self):
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Only the configuration travels to other processes
+        return {'maxsize': self.maxsize, 'cache_dir': self.cache_dir}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_process_state()
+
+    def _disk_path(self, key):
+        # Two-character subdirectories to avoid huge directories
+        return os.path.join(self.cache_dir, key[:2], key + '.txt')
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, text):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file in the same directory and atomically move it into place
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        '''
+        Method to look up a key without extracting anything.
+        Input: key (str) - as returned by content_hash
+        Output: text (str) or None if the key is not cached
+        '''
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+        if self.cache_dir is not None:
+            text = self._read_disk(key)
+            if text is not None:
+                with self._lock: self.disk_hits += 1
+                self._remember(key, text)
+                return text
+        return None
+
+    def extract_text(self, html_content):
+        '''
+        Method to extract text from source code, skipping the parsing if the same content was seen before.
+        Input: source code (str)
+        Output: text (str), the same as extract_text(html_content)
+        Dependencies: extract_text from text_extractor
+        '''
+        key = content_hash(html_content)
+        text = self.get(key)
+        if text is not None:
+            return text
+        with self._lock: self.misses += 1
+        text = extract_text(html_content)
+        self._remember(key, text)
+        if self.cache_dir is not None: self._write_disk(key, text)
+        return text
+
+    def clear(self):
+        '''
+        Method to empty the in-process LRU and reset the counters (the on-disk store is kept).
+        '''
+        self._init_process_state()
+
+    def stats(self):
+        '''
+        Method to get the hit/miss counters of this process.
+        Output: stats (dict) with memory_hits, disk_hits, misses, lookups, hit_rate, and memory_size
+        '''
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'lookups': lookups,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_size': len(self._memory),
+        }
+
+if __name__ == "__main__":
+    print("Running script as main...")
+    import pickle
+    import shutil
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = TextCache(maxsize=2, cache_dir=cache_dir)
+        html = "<p>Harvard University</p> \n \n \n <p>test      test</p>"
+        assert cache.extract_text(html) == extract_text(html)
+        assert cache.extract_text(html) == extract_text(html)
+        assert cache.stats()['misses'] == 1 and cache.stats()['memory_hits'] == 1
+        # Evict from the LRU and check that the disk store answers
+        cache.extract_text("<p>a</p>")
+        cache.extract_text("<p>b</p>")
+        assert cache.stats()['memory_size'] == 2
+        assert cache.extract_text(html) == extract_text(html)
+        assert cache.stats()['disk_hits'] == 1
+        # A pickled copy (as sent to a worker process) shares the disk store but not the LRU
+        worker_cache = pickle.loads(pickle.dumps(cache))
+        assert worker_cache.stats()['lookups'] == 0
+        assert worker_cache.extract_text("<p>a</p>") == "a"
+        assert worker_cache.stats()['disk_hits'] == 1
+        # Non-string input is handled like extract_text
+        assert cache.extract_text(float('nan')) == extract_text(float('nan'))
+        # A str and its UTF-8 bytes are different inputs when the page declares another charset
+        latin = '<meta charset="iso-8859-1"><p>Café</p>'
+        assert cache.extract_text(latin) == 'Café'
+        assert cache.extract_text(latin.encode('utf-8')) == extract_text(latin.encode('utf-8')) == 'CafÃ©'
+        # Memory-mapped files are keyed by their content
+        for content in (b'<p>first file 1</p>\n', b'<p>other file 2</p>\n'):
+            path = os.path.join(cache_dir, 'page.html')
+            with open(path, 'wb') as f:
+                f.write(content)
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                assert cache.extract_text(mapped) == extract_text(content)
+        print(cache.stats())
+    finally:
+        shutil.rmtree(cache_dir)
+    print("All tests passed!")
@@ -2,9 +2,28 @@
 # Emilio Lehoucq
 
 # Importing libraries
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
+import codecs
+import mmap
 import re
 
+# Byte order marks, checked before anything else
+_boms = [(codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+         (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')]
+# Pattern for <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+_meta_charset_pattern = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.-]+)', re.IGNORECASE)
+# Number of bytes to look at for the meta tag (the HTML spec says 1024; some sites put it later)
+_sniff_size = 4096
+# Tags that start a new block in extract_text_blocks ('[document]' is the BeautifulSoup object itself)
+_block_tags = {'[document]', 'html', 'body', 'header', 'footer', 'main', 'nav', 'aside', 'section', 'article', 'form',
+               'div', 'p', 'blockquote', 'pre', 'address', 'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'table', 'caption',
+               'tr', 'td', 'th', 'fieldset', 'legend', 'figure', 'figcaption', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+_heading_tags = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Short blocks that are all bold (e.g., <p><strong>Salary:</strong></p>) are also used as headings
+_bold_tags = {'b', 'strong'}
+_max_bold_heading_length = 100
+_whitespace_pattern = re.compile(r'\s+')
+
 # Defining functions
 def remove_excess_line_breaks(input_string):
     '''
@@ -33,14 +52,54 @@ def remove_extra_tabs(string):
     '''
     return re.sub(r'(( \t){2,}|\t{2,})', '\t', string)
 
-def extract_text(html_content):
+def sniff_encoding(data):
     '''
-    Function to extract text from source code.
-    Input: source code (str)
+    Function to guess the encoding of source code in bytes, looking only at its beginning.
+    Input: data (bytes, bytearray, memoryview, or mmap)
+    Output: encoding (str) from the byte order mark or the meta charset tag, or None if there is none
+    (as in the HTML spec, a meta tag that names UTF-16 or UTF-32 means UTF-8: if it can be read as ASCII, the page is not UTF-16)
+    Dependencies: codecs and re
+    '''
+    head = bytes(data[:_sniff_size])
+    for bom, encoding in _boms:
+        if head.startswith(bom):
+            return encoding
+    match = _meta_charset_pattern.search(head)
+    if match:
+        try:
+            encoding = codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            return None
+        return 'utf-8' if encoding.startswith(('utf-16', 'utf-32')) else encoding
+    return None
+
+def decode_html(data, encoding=None):
+    '''
+    Function to decode source code in bytes into a string with a single copy.
+    The buffer is decoded in place (no intermediate bytes object), so memoryviews and mmaps are not copied first.
+    Input: data (bytes, bytearray, memoryview, or mmap), encoding (str or None to sniff it)
+    Output: source code (str)
+    Dependencies: sniff_encoding
+    '''
+    if encoding is None: encoding = sniff_encoding(data)
+    if encoding is not None:
+        try:
+            return str(data, encoding, 'replace')
+        except LookupError:
+            pass
+    # No (valid) declaration: most pages are UTF-8, and the rest are usually Windows-1252
+    try:
+        return str(data, 'utf-8')
+    except UnicodeDecodeError:
+        return str(data, 'windows-1252', 'replace')
+
+def soup_to_text(soup):
+    '''
+    Function to get the cleaned text of a BeautifulSoup object.
+    Input: soup (BeautifulSoup)
     Output: text (str)
-    Dependencies: BeautifulSoup from bs4 and remove_excess_line_breaks, remove_extra_spaces, and remove_extra_tabs (which depend on re)
+    Dependencies: remove_excess_line_breaks, remove_extra_spaces, and remove_extra_tabs (which depend on re)
     '''
-    soup = BeautifulSoup(str(html_content), 'html.parser') # Using str to avoid TypeError: object of type 'float' has no len()
     # " " to join the bits of text together
     # Not using strip=True because it removes all leading and trailing whitespaces. I want to keep some for structure
     # https://www.crummy.com/software/BeautifulSoup/bs4/doc/
@@ -53,9 +112,148 @@ def extract_text(html_content):
     text = remove_extra_tabs(text)
     return text
 
+def _to_str(html_content):
+    '''
+    Function to get source code as a string, decoding bytes-like input with decode_html.
+    '''
+    if isinstance(html_content, (bytes, bytearray, memoryview, mmap.mmap)):
+        return decode_html(html_content)
+    if not isinstance(html_content, str):
+        return str(html_content) # Using str to avoid TypeError: object of type 'float' has no len()
+    return html_content
+
+def extract_text(html_content):
+    '''
+    Function to extract text from source code.
+    Input: source code (str, or bytes/bytearray/memoryview/mmap, which are decoded with decode_html)
+    Output: text (str)
+    Dependencies: BeautifulSoup from bs4, decode_html, and soup_to_text
+    '''
+    soup = BeautifulSoup(_to_str(html_content), 'html.parser')
+    return soup_to_text(soup)
+
+def _is_bold(string, block):
+    '''
+    Function to check if a string is inside a bold element within its block.
+    '''
+    for parent in string.parents:
+        if parent is block:
+            return False
+        if parent.name in _bold_tags:
+            return True
+    return False
+
+def extract_text_blocks(html_content):
+    '''
+    Function to extract text from source code as a list of blocks (paragraphs, list items, headings, cells...).
+    Each block is a dict with:
+    - tag: name of the block element (e.g., 'p', 'li', 'h2'; '[document]' for text outside any block element)
+    - heading: text of the closest heading before the block (None if there is none). Headings are h1-h6
+      and short blocks that are all bold, like <p><strong>Salary:</strong></p>
+    - is_heading: whether the block itself is a heading
+    - start, end: offsets of the block in the returned text, so text[start:end] is the text of the block
+    The text of each block has its whitespace collapsed, and blocks are joined with line breaks.
+    The text is similar to (but not the same as) the output of extract_text.
+
+    Input: source code (str, or bytes/bytearray/memoryview/mmap)
+    Output: text (str), blocks (list of dict)
+    Dependencies: BeautifulSoup and NavigableString from bs4, re
+    '''
+    soup = BeautifulSoup(_to_str(html_content), 'html.parser')
+    # Group the strings by their closest block element
+    # Only plain NavigableStrings: comments, scripts, styles, and templates are subclasses
+    groups = []
+    for string in soup.find_all(string=True):
+        if type(string) is not NavigableString:
+            continue
+        block = next(parent for parent in string.parents if parent.name in _block_tags)
+        if groups and groups[-1][0] is block:
+            groups[-1][1].append(string)
+        else:
+            groups.append((block, [string]))
+    # Build the text and the blocks
+    parts = []
+    blocks = []
+    heading = None
+    position = 0
+    for block, strings in groups:
+        block_text = _whitespace_pattern.sub(' ', ' '.join(strings)).strip()
+        if not block_text:
+            continue
+        is_heading = block.name in _heading_tags or (
+            len(block_text) <= _max_bold_heading_length and all(not string.strip() or _is_bold(string, block) for string in strings))
+        if is_heading: heading = block_text
+        blocks.append({'tag': block.name, 'heading': heading if not is_heading else None, 'is_heading': is_heading,
+                       'start': position, 'end': position + len(block_text)})
+        parts.append(block_text)
+        position += len(block_text) + 1
+    return '\n'.join(parts), blocks
+
+def select_sections(text, blocks, heading_pattern):
+    '''
+    Function to get the text of the sections whose heading matches a pattern (e.g., to run check_salary on
+    the "Compensation" section only). The heading itself is included.
+    Input: text (str) and blocks (list of dict) from extract_text_blocks, heading_pattern (str or compiled pattern)
+    Output: section_text (str) - the matching sections joined with line breaks, '' if no heading matches
+    Dependencies: re
+    '''
+    heading_pattern = re.compile(heading_pattern, re.IGNORECASE) if isinstance(heading_pattern, str) else heading_pattern
+    selected = []
+    for block in blocks:
+        heading = text[block['start']:block['end']] if block['is_heading'] else block['heading']
+        if heading is not None and heading_pattern.search(heading):
+            selected.append(text[block['start']:block['end']])
+    return '\n'.join(selected)
+
+def extract_text_from_file(path, encoding=None):
+    '''
+    Function to extract text from a file with source code (e.g., a page stored in an archive).
+    The file is memory-mapped and decoded once, so it is not read into an intermediate bytes object.
+    Input: path (str), encoding (str or None to sniff it)
+    Output: text (str)
+    Dependencies: mmap, decode_html, and extract_text
+    '''
+    with open(path, 'rb') as f:
+        # Empty files cannot be memory-mapped
+        if f.seek(0, 2) == 0:
+            return extract_text('')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            html_content = decode_html(mapped, encoding)
+    return extract_text(html_content)
+
 if __name__ == "__main__":
     print("Running script as main...")
     assert extract_text("Harvard University \n \n \n \n \n \n \n O p p o r t u") == "Harvard University\n O p p o r t u"  
     assert extract_text("test      test") == "test test"
     assert extract_text("test \t \t \t test") == "test\t test"
+    assert extract_text(float('nan')) == "nan"
+    # Bytes input with and without a declared charset
+    assert extract_text('<p>Caf\u00e9</p>'.encode('utf-8')) == "Caf\u00e9"
+    assert extract_text(memoryview('<p>Caf\u00e9</p>'.encode('utf-8'))) == "Caf\u00e9"
+    assert extract_text('<meta charset="iso-8859-1"><p>Caf\u00e9</p>'.encode('latin-1')) == "Caf\u00e9"
+    assert extract_text(b'<meta charset="utf-16"><p>Salary $50,000</p>') == "Salary $50,000"
+    assert sniff_encoding(b'<meta charset="UTF-32LE">') == 'utf-8' and sniff_encoding(codecs.BOM_UTF16_LE + '<p>'.encode('utf-16-le')) == 'utf-16'
+    assert extract_text('<p>Caf\u00e9</p>'.encode('windows-1252')) == "Caf\u00e9"
+    assert extract_text(codecs.BOM_UTF8 + '<p>Caf\u00e9</p>'.encode('utf-8')) == "Caf\u00e9"
+    # Memory-mapped file
+    import os
+    import tempfile
+    with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as f:
+        f.write('<meta http-equiv="Content-Type" content="text/html; charset=utf-8"><p>test      test</p>'.encode('utf-8'))
+    assert extract_text_from_file(f.name) == "test test"
+    os.remove(f.name)
+    # Blocks with headings and offsets
+    html = '''<h1>Assistant Professor</h1><p>The   department of counseling invites applications.</p>
+    <h2>Compensation</h2><ul><li>Salary: $70,000&nbsp;- $80,000</li><li>Benefits</li></ul>
+    <p><strong>Application:</strong></p><p>Apply <a href="#">online</a>.</p><script>var x = "$1,000";</script>'''
+    text, blocks = extract_text_blocks(html)
+    assert [text[block['start']:block['end']] for block in blocks] == [
+        "Assistant Professor", "The department of counseling invites applications.", "Compensation",
+        "Salary: $70,000 - $80,000", "Benefits", "Application:", "Apply online ."]
+    assert [block['heading'] for block in blocks] == [
+        None, "Assistant Professor", None, "Compensation", "Compensation", None, "Application:"]
+    assert [block['tag'] for block in blocks] == ['h1', 'p', 'h2', 'li', 'li', 'p', 'p']
+    assert select_sections(text, blocks, r'compensation|salary') == "Compensation\nSalary: $70,000 - $80,000\nBenefits"
+    assert select_sections(text, blocks, r'requirements') == ""
+    assert extract_text_blocks("just text") == ("just text", [{'tag': '[document]', 'heading': None, 'is_heading': False, 'start': 0, 'end': 9}])
     print("All tests passed!")
\ No newline at end of file